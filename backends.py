@@ -0,0 +1,292 @@
+import os
+import sys
+import json
+import zlib
+import struct
+
+from storage import (
+    READ_CHUNK_SIZE, PreparedWrite, SnapshotReader, TaskJournal, dump_snapshot,
+    snapshot_token
+)
+from task_model import PRIORITIES, PRIORITY_ORDER, format_due_date, parse_due_date
+
+# Storage backends for the task file.
+#
+# A backend reads and writes the full list of saved items (task dicts, or
+# plain strings from old console files). The format is picked from the
+# file extension: .json (the original pretty-printed array), .jsonl (one
+# compact JSON item per line), .bin (length-prefixed binary records) and
+# .db (an SQLite database, see sqlite_store.py). Journaling works the same
+# for every backend.
+
+TASK_FILE = os.environ.get("TODO_TASK_FILE", "tasks.json")
+
+
+class StorageBackend:
+    """Interface of a task file format
+
+    reader() returns an iterable of items with a token attribute that is
+    set once iteration is complete, write(items) replaces the file and
+    returns the token of the new contents. prepare(items) does the same in
+    two steps: it encodes and writes the items aside, and commit() on the
+    result replaces the file and returns the token.
+    """
+
+    extension = None
+    # Paged backends can also change and read single tasks in place
+    paged = False
+
+    def __init__(self, file_name, sync_policy=None):
+        self.file_name = file_name
+        self.sync_policy = sync_policy
+
+    def reader(self):
+        raise NotImplementedError
+
+    def dump(self, items):
+        """The file contents for items, as bytes"""
+        raise NotImplementedError
+
+    def prepare(self, items):
+        return PreparedWrite(self.file_name, self.dump(items), self.sync_policy)
+
+    def write(self, items):
+        return self.prepare(items).commit()
+
+    def close(self):
+        pass
+
+    def read_all(self):
+        """Read every item, return (items, token)"""
+        reader = self.reader()
+        items = list(reader)
+        return items, reader.token
+
+
+class JsonBackend(StorageBackend):
+    """Pretty-printed JSON array, the original tasks.json format"""
+
+    extension = ".json"
+
+    def reader(self):
+        return SnapshotReader(self.file_name)
+
+    def dump(self, items):
+        return dump_snapshot(items)
+
+
+class JsonLinesBackend(StorageBackend):
+    """One compact JSON item per line"""
+
+    extension = ".jsonl"
+
+    def reader(self):
+        return SnapshotReader(self.file_name)
+
+    def dump(self, items):
+        lines = [json.dumps(item, ensure_ascii=False, separators=(",", ":")) for item in items]
+        lines.append("")
+        return "\n".join(lines).encode("utf-8")
+
+
+class BinaryBackend(StorageBackend):
+    """Length-prefixed binary records
+
+    After an 8 byte magic header, every item is a little-endian uint32
+    length followed by a record:
+
+        id            int64   task id
+        flags         uint8   1 = completed, 2 = plain string item,
+                              4 = JSON with other fields follows the text,
+                              8 = no id
+        priority      int8    index into PRIORITIES, -1 = stored in extras
+        due ordinal   int32   date ordinal, 0 = none, -1 = stored in extras
+        text length   uint32  followed by the UTF-8 text
+
+    Anything the fixed fields cannot hold is kept in the trailing JSON, so
+    no field is lost. Task items missing due_date or completed come back
+    with their defaults (None and False), like Task.to_dict() writes them.
+    Files of the first version, whose records have no id field, are still
+    read.
+    """
+
+    extension = ".bin"
+    MAGIC = b"TODOBIN2"
+    OLD_MAGIC = b"TODOBIN1"
+
+    COMPLETED = 1
+    PLAIN_TEXT = 2
+    HAS_EXTRAS = 4
+    NO_ID = 8
+
+    _length = struct.Struct("<I")
+    _header = struct.Struct("<qBbiI")
+    _old_header = struct.Struct("<BbiI")
+
+    def reader(self):
+        return BinaryReader(self.file_name)
+
+    def dump(self, items):
+        parts = [self.MAGIC]
+        for item in items:
+            record = self.encode(item)
+            parts.append(self._length.pack(len(record)))
+            parts.append(record)
+        return b"".join(parts)
+
+    @classmethod
+    def encode(cls, item):
+        if isinstance(item, str):
+            text = item.encode("utf-8")
+            return cls._header.pack(0, cls.PLAIN_TEXT | cls.NO_ID, 0, 0, len(text)) + text
+
+        extras = dict(item)
+        text = extras.pop("text").encode("utf-8")
+        completed = extras.pop("completed", False)
+        flags = cls.COMPLETED if completed is True else 0
+        if completed is not True and completed is not False:
+            extras["completed"] = completed
+
+        task_id = extras.pop("id", None)
+        if type(task_id) is not int or not -2 ** 63 <= task_id < 2 ** 63:
+            if task_id is not None:
+                extras["id"] = task_id
+            task_id = 0
+            flags |= cls.NO_ID
+
+        priority = PRIORITY_ORDER.get(extras.get("priority"), -1)
+        if priority >= 0:
+            del extras["priority"]
+
+        ordinal, due_text = parse_due_date(extras.get("due_date"))
+        if due_text is None:
+            extras.pop("due_date", None)
+        else:
+            ordinal = -1
+
+        if extras:
+            flags |= cls.HAS_EXTRAS
+        record = cls._header.pack(task_id, flags, priority, ordinal or 0, len(text)) + text
+        if extras:
+            record += json.dumps(extras, ensure_ascii=False).encode("utf-8")
+        return record
+
+    @classmethod
+    def decode(cls, buffer, start, end, old=False):
+        if old:
+            flags, priority, ordinal, text_length = cls._old_header.unpack_from(buffer, start)
+            task_id = None
+            offset = start + cls._old_header.size
+        else:
+            task_id, flags, priority, ordinal, text_length = cls._header.unpack_from(buffer, start)
+            offset = start + cls._header.size
+            if flags & cls.NO_ID:
+                task_id = None
+        text = buffer[offset:offset + text_length].decode("utf-8")
+        if flags & cls.PLAIN_TEXT:
+            return text
+
+        item = {} if task_id is None else {"id": task_id}
+        item["text"] = text
+        item["due_date"] = format_due_date(ordinal) if ordinal > 0 else None
+        if priority >= 0:
+            item["priority"] = PRIORITIES[priority]
+        item["completed"] = bool(flags & cls.COMPLETED)
+        if flags & cls.HAS_EXTRAS:
+            item.update(json.loads(buffer[offset + text_length:end].decode("utf-8")))
+        return item
+
+
+class BinaryReader:
+    """Iterate the records of a binary task file, a chunk at a time"""
+
+    def __init__(self, file_name, chunk_size=READ_CHUNK_SIZE):
+        self.file_name = file_name
+        self.chunk_size = chunk_size
+        self.token = snapshot_token(b"")
+
+    def __iter__(self):
+        if not os.path.exists(self.file_name):
+            return
+
+        size = 0
+        crc = 0
+        length = BinaryBackend._length
+        decode = BinaryBackend.decode
+        with open(self.file_name, 'rb') as file:
+            buffer = file.read(max(self.chunk_size, len(BinaryBackend.MAGIC)))
+            size += len(buffer)
+            crc = zlib.crc32(buffer, crc)
+            if buffer.startswith(BinaryBackend.MAGIC):
+                old = False
+            elif buffer.startswith(BinaryBackend.OLD_MAGIC):
+                old = True
+            else:
+                raise ValueError("Not a binary task file")
+            pos = len(BinaryBackend.MAGIC)
+
+            while True:
+                # Make sure the next length and record are in the buffer
+                needed = length.size
+                if len(buffer) - pos >= length.size:
+                    needed += length.unpack_from(buffer, pos)[0]
+                if len(buffer) - pos < needed:
+                    chunk = file.read(max(self.chunk_size, needed))
+                    if chunk:
+                        size += len(chunk)
+                        crc = zlib.crc32(chunk, crc)
+                        buffer = buffer[pos:] + chunk
+                        pos = 0
+                        continue
+                    if pos != len(buffer):
+                        raise ValueError("Unexpected end of binary task file")
+                    break
+
+                start = pos + length.size
+                pos = start + needed - length.size
+                yield decode(buffer, start, pos, old)
+
+        self.token = {"size": size, "crc": crc}
+
+
+BACKENDS = {backend.extension: backend for backend in (JsonBackend, JsonLinesBackend, BinaryBackend)}
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+
+def open_backend(file_name, sync_policy=None):
+    """Backend for a task file, chosen by its extension (JSON by default)"""
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension in SQLITE_EXTENSIONS:
+        # sqlite3 is only imported by those who use it
+        from sqlite_store import SqliteBackend
+        return SqliteBackend(file_name, sync_policy)
+    return BACKENDS.get(extension, JsonBackend)(file_name, sync_policy)
+
+
+def convert_file(source, target, convert=None):
+    """Copy the tasks of one task file into another, possibly in another format
+
+    Pending journal records of the source are applied first, the target
+    gets a fresh snapshot without a journal. convert(item), if given,
+    changes each item on the way.
+    """
+    items, token = open_backend(source).read_all()
+    items = TaskJournal(source).replay_items(items, token)
+    if convert is not None:
+        items = [convert(item) for item in items]
+    backend = open_backend(target)
+    try:
+        target_token = backend.write(items)
+    finally:
+        backend.close()
+    TaskJournal(target).reset(target_token)
+    return len(items)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python backends.py SOURCE TARGET")
+        print("Formats by extension: " + ", ".join(list(BACKENDS) + list(SQLITE_EXTENSIONS)))
+        sys.exit(2)
+    count = convert_file(sys.argv[1], sys.argv[2])
+    print(f"{count} tasks written to {sys.argv[2]}")
@@ -0,0 +1,793 @@
+import os
+import sys
+import json
+import time
+import random
+import itertools
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+import platform
+import statistics
+import multiprocessing
+from datetime import date
+
+from backends import BACKENDS, open_backend
+from search_index import SearchIndex, SearchResults, fold
+from storage import DURABILITY_LEVELS, SyncPolicy, TaskJournal, read_snapshot, write_snapshot
+from task_engine import TaskEngine
+from task_index import TaskIndexes
+from task_model import Task, TaskStore, parse_due_date
+from view_cache import VIEW_SUFFIX
+
+# Benchmarks for the to-do application.
+#
+# Run one benchmark with `python benchmark.py <name> [options]`,
+# `python benchmark.py --help` lists the available benchmarks.
+
+WORDS = ["alışveriş", "rapor", "toplantı", "ödev", "fatura", "email", "review", "deploy", "İstanbul", "ışık"]
+
+# Accents, combining marks, other scripts and emoji
+UNICODE_WORDS = ["ÇĞİÖŞÜ", "naïve", "cafe\u0301", "日本語", "Ελληνικά", "привет", "🚀", "✓ tamam", "ﬁle"]
+
+# Shapes of generated task lists. priority_weights are for low, medium and
+# high, due_share is the share of tasks with a due date and due_window
+# clusters due dates within that many days of DUE_CENTER instead of
+# spreading them over the year
+TASK_PROFILES = {
+    "uniform": {"priority_weights": None, "due_share": 0.7, "due_window": None, "words": WORDS, "text_words": (2, 2)},
+    "skewed": {"priority_weights": (1, 7, 2), "due_share": 0.9, "due_window": 30, "words": WORDS, "text_words": (2, 2)},
+    "sparse": {"priority_weights": None, "due_share": 0.1, "due_window": None, "words": WORDS, "text_words": (2, 2)},
+    "unicode": {
+        "priority_weights": None, "due_share": 0.7, "due_window": None,
+        "words": WORDS + UNICODE_WORDS, "text_words": (1, 6)
+    }
+}
+DUE_CENTER = date(2025, 6, 1).toordinal()
+
+
+def make_task_dicts(count, seed=0, profile="uniform"):
+    """Generate reproducible task dictionaries"""
+    shape = TASK_PROFILES[profile]
+    words = shape["words"]
+    fewest, most = shape["text_words"]
+    rng = random.Random(seed)
+    tasks = []
+    for i in range(count):
+        due_date = None
+        if rng.random() < shape["due_share"]:
+            if shape["due_window"] is None:
+                due_date = f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            else:
+                window = shape["due_window"]
+                due_date = date.fromordinal(DUE_CENTER + rng.randint(-window, window)).isoformat()
+        length = most if fewest == most else rng.randint(fewest, most)
+        text = " ".join(rng.choice(words) for _ in range(length))
+        if shape["priority_weights"] is None:
+            priority = rng.choice(("low", "medium", "high"))
+        else:
+            priority = rng.choices(("low", "medium", "high"), shape["priority_weights"])[0]
+        tasks.append({
+            "id": i + 1,
+            "text": f"{text} {i}",
+            "due_date": due_date,
+            "priority": priority,
+            "completed": rng.random() < 0.3
+        })
+    return tasks
+
+
+class LegacyTask:
+    """The task class before __slots__, kept to compare against"""
+
+    def __init__(self, text, due_date=None, priority="medium", completed=False):
+        self.text = text
+        self.due_date = due_date
+        self.priority = priority
+        self.completed = completed
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            text=data["text"],
+            due_date=data.get("due_date"),
+            priority=data.get("priority", "medium"),
+            completed=data.get("completed", False)
+        )
+
+
+def legacy_is_valid_date(date_str):
+    """The GUI's date check before due dates were parsed, it accepts 2025-02-31"""
+    try:
+        year, month, day = date_str.split('-')
+        if len(year) != 4 or len(month) != 2 or len(day) != 2:
+            return False
+        int(year)
+        int(month)
+        int(day)
+        return True
+    except ValueError:
+        return False
+
+
+def legacy_date_key(task):
+    """The GUI's date sort key before due ordinals, compares strings"""
+    return (task.due_date is None, task.due_date or "9999-12-31")
+
+
+def legacy_task_row(task):
+    """Task.__str__ before rows were cached, it builds its tables on every call"""
+    status = "✓ " if task.completed else "□ "
+    priority_markers = {"low": "⬇️", "medium": "➡️", "high": "⬆️"}
+    priority_mark = priority_markers.get(task.priority, "➡️")
+
+    date_str = ""
+    if task.due_date:
+        date_str = f" [{task.due_date}]"
+
+    return f"{status}{priority_mark} {task.text}{date_str}"
+
+
+def parse_sizes(text):
+    return [int(size) for size in text.split(",")]
+
+
+def time_calls(func, repeat):
+    """Call func repeat times and return the duration of each call in seconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(samples):
+    """Mean, median, 95th percentile and max of samples, in milliseconds"""
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return {
+        "mean": statistics.mean(ordered) * 1000,
+        "p50": statistics.median(ordered) * 1000,
+        "p95": p95 * 1000,
+        "max": ordered[-1] * 1000
+    }
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(cell)) for cell in column) for column in zip(headers, *rows)]
+    print("  ".join(str(cell).ljust(width) for cell, width in zip(headers, widths)))
+    print("  ".join("-" * width for width in widths))
+    for row in rows:
+        print("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)))
+
+
+def format_ms(value):
+    return f"{value:.3f}"
+
+
+def bench_durability(args):
+    """Latency of snapshot saves and journal appends per durability level"""
+    tasks = make_task_dicts(args.tasks)
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, "tasks.json")
+        for level in DURABILITY_LEVELS:
+            policy = SyncPolicy(level, args.group_ms)
+
+            samples = time_calls(lambda: write_snapshot(file_name, tasks, policy), args.repeat)
+            stats = summarize(samples)
+            rows.append([level, f"snapshot ({args.tasks} tasks)"] + [format_ms(stats[k]) for k in ("mean", "p50", "p95", "max")])
+
+            journal = TaskJournal(file_name, compact_threshold=sys.maxsize, sync_policy=policy)
+            record = {"op": "add", "id": tasks[0]["id"], "item": tasks[0]}
+            samples = time_calls(lambda: journal.append(record), args.repeat)
+            journal.close()
+            stats = summarize(samples)
+            rows.append([level, "journal append"] + [format_ms(stats[k]) for k in ("mean", "p50", "p95", "max")])
+
+            policy.flush()
+
+    print(f"Durability cost, {args.repeat} writes each, group commit every {args.group_ms} ms")
+    print_table(["level", "operation", "mean ms", "p50 ms", "p95 ms", "max ms"], rows)
+
+
+TASK_REPRESENTATIONS = {
+    "legacy class": lambda tasks_data: [LegacyTask.from_dict(data) for data in tasks_data],
+    "slots Task": lambda tasks_data: [Task.from_dict(data) for data in tasks_data],
+    "columnar TaskStore": TaskStore.from_dicts
+}
+
+
+def bench_memory(args):
+    """Bytes per task and load time of each task representation"""
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in parse_sizes(args.sizes):
+            file_name = os.path.join(directory, "tasks.json")
+            write_snapshot(file_name, make_task_dicts(size))
+
+            for name, build in TASK_REPRESENTATIONS.items():
+                # Load time covers parsing the file and building the tasks
+                start = time.perf_counter()
+                tasks_data, _ = read_snapshot(file_name)
+                tasks = build(tasks_data)
+                load_time = time.perf_counter() - start
+                del tasks
+
+                del tasks_data
+
+                # Memory retained by the tasks once the parsed dicts are gone,
+                # including the strings they keep alive
+                tracemalloc.start()
+                tasks_data, _ = read_snapshot(file_name)
+                tasks = build(tasks_data)
+                del tasks_data
+                used = tracemalloc.get_traced_memory()[0]
+                tracemalloc.stop()
+                del tasks
+
+                rows.append([size, name, f"{used / size:.1f}", f"{load_time:.3f}"])
+
+    print("Task representations")
+    print_table(["tasks", "representation", "bytes/task", "load s"], rows)
+
+
+def bench_formats(args):
+    """Save time, load time and file size of each storage backend"""
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in parse_sizes(args.sizes):
+            tasks_data = make_task_dicts(size)
+            for extension in list(BACKENDS) + [".db"]:
+                backend = open_backend(os.path.join(directory, "tasks" + extension))
+
+                start = time.perf_counter()
+                backend.write(tasks_data)
+                save_time = time.perf_counter() - start
+
+                start = time.perf_counter()
+                items, _ = backend.read_all()
+                load_time = time.perf_counter() - start
+                del items
+                backend.close()
+
+                file_size = os.path.getsize(backend.file_name)
+                rows.append([
+                    size, type(backend).__name__, f"{save_time:.3f}", f"{load_time:.3f}",
+                    f"{file_size / 1e6:.2f}", f"{file_size / size:.1f}"
+                ])
+
+    print("Storage backends")
+    print_table(["tasks", "backend", "save s", "load s", "size MB", "bytes/task"], rows)
+
+
+SEARCH_QUERIES = ["r", "rap", "rapor", "ista", "ışık", "rapor top", "12345", "zzz"]
+
+
+def bench_search(args):
+    """Index build time and per-keystroke search latency against a linear scan"""
+    rows = []
+    for size in parse_sizes(args.sizes):
+        tasks = [Task.from_dict(data) for data in make_task_dicts(size)]
+        task_by_id = {task.id: task for task in tasks}
+        indexes = TaskIndexes()
+        indexes.build(tasks)
+
+        start = time.perf_counter()
+        search_index = SearchIndex()
+        search_index.build(tasks)
+        build_ms = format_ms((time.perf_counter() - start) * 1000)
+        rows.append([size, "build index", "", build_ms, "", "", "", "", ""])
+
+        for query in SEARCH_QUERIES:
+            # What the GUI does per keystroke: search, then order the
+            # matches and find the first screen of rows. The GUI blocks for
+            # the search and finds rows between events. Each keystroke
+            # narrows the results of the one before
+            def keystroke(text, previous=None):
+                start = time.perf_counter()
+                ids = search_index.search(text, text[:-1], None if previous is None else previous.ids) or set()
+                searched = time.perf_counter()
+                results = SearchResults(indexes["name"], ids, task_by_id, previous)
+                for row in range(min(len(results), 30)):
+                    results.id_at(row)
+                search_times.append(searched - start)
+                screen_times.append(time.perf_counter() - start)
+                return results
+
+            def typed():
+                results = None
+                for length in range(1, len(query) + 1):
+                    results = keystroke(query[:length], results)
+                return len(results)
+
+            # The naive way, a substring test on every task
+            def linear():
+                needle = fold(query)
+                return len([task for task in tasks if needle in fold(task.text)])
+
+            # The first time, the unions of short prefixes are not made yet
+            search_index.short_prefixes.clear()
+            search_times, screen_times = [], []
+            matches = typed()
+            first_ms = max(screen_times) * 1000
+            search_times, screen_times = [], []
+            for _ in range(args.repeat):
+                typed()
+            search_ms = summarize(search_times)["max"]
+            screen_ms = summarize(screen_times)
+            pasted_ms = summarize(time_calls(lambda: keystroke(query), args.repeat))["p50"]
+            linear_ms = summarize(time_calls(linear, 1))["p50"]
+            rows.append([size, repr(query), matches, format_ms(search_ms), format_ms(screen_ms["p50"]),
+                         format_ms(screen_ms["max"]), format_ms(first_ms), format_ms(pasted_ms),
+                         format_ms(linear_ms)])
+
+    print(f"Search, per keystroke while typing each query {args.repeat} times: search alone "
+          "and with the first screen of rows (first: the first time, pasted: whole query at once, "
+          "linear scan: one run)")
+    print_table(["tasks", "query", "matches", "search max ms", "screen p50 ms", "screen max ms",
+                 "first ms", "pasted ms", "linear ms"], rows)
+
+
+def bench_dates(args):
+    """Date validation, date sort and due date queries: date strings against ordinals"""
+    today = DUE_CENTER
+    today_text = date.fromordinal(today).isoformat()
+    week_end_text = date.fromordinal(today + 7).isoformat()
+    rows = []
+    for size in parse_sizes(args.sizes):
+        tasks_data = make_task_dicts(size, profile="skewed")
+        legacy = [LegacyTask.from_dict(data) for data in tasks_data]
+        tasks = [Task.from_dict(data) for data in tasks_data]
+        date_texts = [data["due_date"] for data in tasks_data if data["due_date"]]
+        indexes = TaskIndexes()
+        indexes.build(tasks)
+
+        cases = [
+            (
+                "validate",
+                lambda: [legacy_is_valid_date(text) for text in date_texts],
+                lambda: [parse_due_date(text)[0] is not None for text in date_texts]
+            ),
+            # Both sorts start from unsorted tasks, the index is built
+            # once per load and kept up to date afterwards
+            (
+                "sort by date",
+                lambda: sorted(legacy, key=legacy_date_key),
+                lambda: indexes["date"].build(tasks)
+            ),
+            (
+                "overdue",
+                lambda: [task for task in legacy if task.due_date and task.due_date < today_text],
+                lambda: indexes.overdue(today)
+            ),
+            (
+                "due within 7 days",
+                lambda: [task for task in legacy if task.due_date and today_text <= task.due_date < week_end_text],
+                lambda: indexes.due_within(7, today)
+            )
+        ]
+        for name, strings, ordinals in cases:
+            string_ms = summarize(time_calls(strings, args.repeat))["p50"]
+            ordinal_ms = summarize(time_calls(ordinals, args.repeat))["p50"]
+            rows.append([
+                size, name, format_ms(string_ms), format_ms(ordinal_ms), f"{string_ms / max(ordinal_ms, 1e-6):.1f}x"
+            ])
+
+    print(f"Due dates, median of {args.repeat} runs")
+    print_table(["tasks", "operation", "strings ms", "ordinals ms", "speedup"], rows)
+
+
+def bench_rows(args):
+    """Formatting every row of a repopulated list, before and after the row cache"""
+    rows = []
+    for size in parse_sizes(args.sizes):
+        tasks_data = make_task_dicts(size)
+        tasks = [Task.from_dict(data) for data in tasks_data]
+        indexes = TaskIndexes()
+        indexes.build(tasks)
+        task_by_id = {task.id: task for task in tasks}
+        # Rows in the order of the list, like a repopulate that draws them all
+        ordered = [task_by_id[task_id] for task_id in indexes["name"].ids()]
+
+        def first_render():
+            # Fresh tasks, nothing is cached yet
+            samples = []
+            for _ in range(args.repeat):
+                fresh = [Task.from_dict(data) for data in tasks_data]
+                start = time.perf_counter()
+                for task in fresh:
+                    str(task)
+                samples.append(time.perf_counter() - start)
+            return samples
+
+        def all_changed():
+            # Every task changed since the last repopulate, the flips
+            # are timed too
+            for task in ordered:
+                task.completed = not task.completed
+            for task in ordered:
+                str(task)
+
+        cases = [
+            ("former __str__", time_calls(lambda: [legacy_task_row(task) for task in ordered], args.repeat)),
+            ("first render", first_render()),
+            ("repopulate, cached", time_calls(lambda: [str(task) for task in ordered], args.repeat)),
+            ("repopulate, all changed", time_calls(all_changed, args.repeat))
+        ]
+        for name, samples in cases:
+            result = summarize(samples)
+            rows.append([size, name, format_ms(result["p50"]), f"{result['p50'] * 1000 / size:.3f}"])
+
+    print(f"Row formatting, median of {args.repeat} runs")
+    print_table(["tasks", "case", "ms", "us/row"], rows)
+
+
+# Started in a fresh interpreter for each run. They print #paint once the
+# first screen is drawn and #ready once every task can be used
+STARTUP_SCRIPTS = {
+    "todo_app.py": """
+import todo_app
+app = todo_app.TodoApp()
+app.display_menu()
+print("#paint", flush=True)
+app.wait_for_tasks()
+print("#ready", flush=True)
+""",
+    "todo_app_gui.py": """
+import tkinter as tk
+import todo_app_gui
+root = tk.Tk()
+app = todo_app_gui.TodoAppGUI(root)
+root.update_idletasks()
+print("#paint", flush=True)
+while not app.loaded:
+    root.update()
+print("#ready", flush=True)
+app.on_close()
+"""
+}
+
+
+def time_startup(script, file_name):
+    """Seconds from process start to #paint and to #ready"""
+    env = dict(os.environ, TODO_TASK_FILE=file_name)
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    times = {}
+    for line in process.stdout:
+        if line.startswith("#"):
+            times[line.strip()] = time.perf_counter() - start
+    error = process.stderr.read()
+    if process.wait() != 0 or len(times) != 2:
+        lines = error.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"exit status {process.returncode}")
+    return times["#paint"], times["#ready"]
+
+
+def bench_startup(args):
+    """Time to first paint and to interactive of both applications"""
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in parse_sizes(args.sizes):
+            file_name = os.path.join(directory, "tasks.json")
+            write_snapshot(file_name, make_task_dicts(size))
+            runs = [
+                ("todo_app.py", "", STARTUP_SCRIPTS["todo_app.py"]),
+                ("todo_app_gui.py", "no view cache", STARTUP_SCRIPTS["todo_app_gui.py"]),
+                ("todo_app_gui.py", "view cache", STARTUP_SCRIPTS["todo_app_gui.py"])
+            ]
+            for app, variant, script in runs:
+                samples = []
+                try:
+                    for _ in range(args.repeat):
+                        # The GUI saves the view cache when it closes
+                        if variant == "no view cache" and os.path.exists(file_name + VIEW_SUFFIX):
+                            os.remove(file_name + VIEW_SUFFIX)
+                        samples.append(time_startup(script, file_name))
+                except (OSError, RuntimeError) as e:
+                    rows.append([size, app, variant, "failed", str(e)])
+                    continue
+                paint = statistics.median(sample[0] for sample in samples)
+                ready = statistics.median(sample[1] for sample in samples)
+                rows.append([size, app, variant, f"{paint:.3f}", f"{ready:.3f}"])
+
+    print(f"Startup, median of {args.repeat} runs from process start")
+    print_table(["tasks", "application", "variant", "first paint s", "interactive s"], rows)
+
+
+def data_cases(backend, tasks_data):
+    """(name, function) of the load, save and sort paths without a GUI"""
+    tasks = [Task.from_item(item) for item in tasks_data]
+    return [
+        ("load", lambda: [Task.from_item(item) for item in backend.read_all()[0]]),
+        ("save", lambda: backend.write(tasks_data)),
+        ("sort", lambda: TaskIndexes().build(tasks)),
+        ("search index", lambda: SearchIndex().build(tasks))
+    ]
+
+
+def open_gui(file_name):
+    """A TodoAppGUI on a hidden Tk root, once its tasks are loaded"""
+    import tkinter as tk
+    import todo_app_gui
+
+    root = tk.Tk()
+    root.withdraw()
+    todo_app_gui.TASK_FILE = file_name
+    app = todo_app_gui.TodoAppGUI(root)
+    while not app.loaded:
+        root.update()
+    return root, app
+
+
+def close_gui(root, app):
+    app.writer.close()
+    app.engine.close()
+    root.destroy()
+
+
+def gui_cases(root, app, file_name):
+    """(name, function) of the GUI paths, on an app with loaded tasks"""
+    rng = random.Random(0)
+    sort_orders = itertools.cycle(("priority", "date", "name"))
+
+    def load():
+        close_gui(*open_gui(file_name))
+
+    def sort():
+        app.sort_by = next(sort_orders)
+        app.populate_task_list()
+        root.update_idletasks()
+
+    def populate():
+        app.populate_task_list()
+        root.update_idletasks()
+
+    def select():
+        row = rng.randrange(app.task_listbox.row_count)
+        app.task_listbox.see(row)
+        app.task_listbox.selection_set(row)
+        app.on_task_select(None)
+
+    def scroll():
+        app.task_listbox.scroll_to(rng.randrange(app.task_listbox.max_offset() + 1))
+        root.update_idletasks()
+
+    return [
+        ("gui load", load),
+        ("gui save", lambda: app.flush_tasks(wait=True)),
+        ("gui sort", sort),
+        ("gui populate", populate),
+        ("gui select", select),
+        ("gui scroll", scroll)
+    ]
+
+
+def compare_results(results, baseline, threshold):
+    """Rows of a comparison with a baseline and the names that got slower"""
+    rows = []
+    regressions = []
+    for name, stats in results.items():
+        before = baseline.get(name)
+        if before is None:
+            rows.append([name, format_ms(stats["p50"]), "", ""])
+            continue
+        change = stats["p50"] / before["p50"] - 1 if before["p50"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        rows.append([name, format_ms(stats["p50"]), format_ms(before["p50"]), f"{change:+.1%}{flag}"])
+    return rows, regressions
+
+
+def bench_suite(args):
+    """Load, save, sort, populate, select and scroll times, saved for comparison"""
+    results = {}
+    gui_error = None
+    with tempfile.TemporaryDirectory() as directory:
+        for size in parse_sizes(args.sizes):
+            tasks_data = make_task_dicts(size, profile=args.profile)
+            file_name = os.path.join(directory, f"tasks-{size}{args.format}")
+            backend = open_backend(file_name)
+            backend.write(tasks_data)
+
+            cases = data_cases(backend, tasks_data)
+            gui = None
+            if args.gui and gui_error is None:
+                try:
+                    gui = open_gui(file_name)
+                    cases += gui_cases(*gui, file_name)
+                except Exception as e:
+                    # Usually no display, the other paths are still measured
+                    gui_error = e
+
+            for name, func in cases:
+                results[f"{name}/{size}"] = summarize(time_calls(func, args.repeat))
+            if gui is not None:
+                close_gui(*gui)
+            backend.close()
+
+    print(f"Suite, {args.profile} tasks in {args.format} files, {args.repeat} runs each")
+    print_table(
+        ["case", "mean ms", "p50 ms", "p95 ms", "max ms"],
+        [[name] + [format_ms(stats[k]) for k in ("mean", "p50", "p95", "max")] for name, stats in results.items()]
+    )
+    if gui_error is not None:
+        print(f"GUI cases skipped: {gui_error}")
+
+    if args.save:
+        report = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "profile": args.profile,
+            "format": args.format,
+            "repeat": args.repeat,
+            "results": results
+        }
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        rows, regressions = compare_results(results, baseline["results"], args.threshold)
+        print()
+        if (baseline.get("profile"), baseline.get("format")) != (args.profile, args.format):
+            print(f"Note: the baseline used {baseline.get('profile')} tasks in {baseline.get('format')} files")
+        print(f"Against {args.compare}, a median more than {args.threshold:.0%} slower is a regression")
+        print_table(["case", "p50 ms", "baseline ms", "change"], rows)
+        if regressions:
+            return 1
+    return 0
+
+
+def concurrent_writer(file_name, writer, changes, use_journal, seed):
+    """Make random changes to this writer's own tasks, return them and the merge counts
+
+    Runs in its own process. Every change is saved at once, as the console
+    does, so saves of the writers keep interleaving.
+    """
+    rnd = random.Random(seed)
+    engine = TaskEngine(file_name, SyncPolicy("none"))
+    engine.use_journal = use_journal
+    engine.load()
+    own = {}  # id -> the item as it should end up
+    for change in range(changes):
+        ids = list(own)
+        kind = rnd.choice(("add", "set", "del")) if len(ids) > 2 else "add"
+        if kind == "add":
+            task = Task(f"w{writer}-{change}")
+            record = engine.add(task)
+            own[task.id] = task.to_dict()
+        else:
+            # Looked up again, a merge replaces the task objects
+            task = engine.tasks[rnd.choice(ids)]
+            if kind == "set":
+                task.priority = rnd.choice(("low", "medium", "high"))
+                task.completed = change % 2 == 1
+                record = engine.update(task)
+                own[task.id] = task.to_dict()
+            else:
+                record = engine.delete(task)
+                del own[task.id]
+        engine.persist([record])
+    engine.close()
+    return own, engine.shared.merges, engine.shared.conflicts
+
+
+def bench_concurrency(args):
+    """Many processes changing one task file at once, checked for lost updates"""
+    failed = False
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in ("snapshot", "journal"):
+            file_name = os.path.join(directory, f"tasks-{mode}{args.format}")
+            tasks_data = make_task_dicts(args.tasks)
+            open_backend(file_name).write(tasks_data)
+
+            start = time.perf_counter()
+            with multiprocessing.Pool(args.processes) as pool:
+                results = pool.starmap(concurrent_writer, [
+                    (file_name, writer, args.changes, mode == "journal", writer)
+                    for writer in range(args.processes)
+                ])
+            seconds = time.perf_counter() - start
+
+            # The file must hold the untouched tasks and every writer's tasks
+            # as that writer left them, nothing lost or duplicated
+            backend = open_backend(file_name)
+            items, token = backend.read_all()
+            items = TaskJournal(file_name).replay_items(items, token)
+            expected = list(tasks_data)
+            for own, merges, conflicts in results:
+                expected.extend(own.values())
+            key = lambda item: json.dumps(item, sort_keys=True)
+            ok = sorted(map(key, items)) == sorted(map(key, expected))
+            failed = failed or not ok
+
+            changes = args.processes * args.changes
+            rows.append([
+                mode, str(changes), f"{seconds:.2f}", f"{changes / seconds:.0f}",
+                str(sum(result[1] for result in results)), str(sum(result[2] for result in results)),
+                "ok" if ok else "LOST UPDATES"
+            ])
+
+    print(f"{args.processes} processes, {args.changes} changes each, on {args.tasks} tasks in {args.format} files")
+    print_table(["mode", "changes", "seconds", "changes/s", "merges", "conflicts", "result"], rows)
+    return 1 if failed else 0
+
+
+BENCHMARKS = {
+    "durability": bench_durability,
+    "memory": bench_memory,
+    "formats": bench_formats,
+    "search": bench_search,
+    "dates": bench_dates,
+    "rows": bench_rows,
+    "startup": bench_startup,
+    "suite": bench_suite,
+    "concurrency": bench_concurrency
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="To-do application benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    durability = subparsers.add_parser("durability", help=bench_durability.__doc__)
+    durability.add_argument("--tasks", type=int, default=1000)
+    durability.add_argument("--repeat", type=int, default=50)
+    durability.add_argument("--group-ms", type=int, default=50)
+
+    memory = subparsers.add_parser("memory", help=bench_memory.__doc__)
+    memory.add_argument("--sizes", default="100000,1000000")
+
+    formats = subparsers.add_parser("formats", help=bench_formats.__doc__)
+    formats.add_argument("--sizes", default="10000,100000,1000000")
+
+    search = subparsers.add_parser("search", help=bench_search.__doc__)
+    search.add_argument("--sizes", default="100000,1000000")
+    search.add_argument("--repeat", type=int, default=20)
+
+    dates = subparsers.add_parser("dates", help=bench_dates.__doc__)
+    dates.add_argument("--sizes", default="100000,1000000")
+    dates.add_argument("--repeat", type=int, default=5)
+
+    rows = subparsers.add_parser("rows", help=bench_rows.__doc__)
+    rows.add_argument("--sizes", default="100000")
+    rows.add_argument("--repeat", type=int, default=5)
+
+    startup = subparsers.add_parser("startup", help=bench_startup.__doc__)
+    startup.add_argument("--sizes", default="1000,100000,1000000")
+    startup.add_argument("--repeat", type=int, default=3)
+
+    suite = subparsers.add_parser("suite", help=bench_suite.__doc__)
+    suite.add_argument("--sizes", default="1000,10000,100000")
+    suite.add_argument("--repeat", type=int, default=10)
+    suite.add_argument("--profile", choices=TASK_PROFILES, default="uniform")
+    suite.add_argument("--format", choices=list(BACKENDS) + [".db"], default=".json")
+    suite.add_argument("--no-gui", dest="gui", action="store_false", help="skip the cases that need a display")
+    suite.add_argument("--save", metavar="FILE", help="write the results as JSON")
+    suite.add_argument("--compare", metavar="FILE", help="compare with results saved by --save")
+    suite.add_argument("--threshold", type=float, default=0.25, help="slowdown that counts as a regression")
+
+    concurrency = subparsers.add_parser("concurrency", help=bench_concurrency.__doc__)
+    concurrency.add_argument("--processes", type=int, default=8)
+    concurrency.add_argument("--changes", type=int, default=50, help="changes per process")
+    concurrency.add_argument("--tasks", type=int, default=1000, help="tasks in the file at the start")
+    concurrency.add_argument("--format", choices=list(BACKENDS), default=".json")
+
+    args = parser.parse_args(argv)
+    # Benchmarks that check results return an exit status
+    return BENCHMARKS[args.benchmark](args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
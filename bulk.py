@@ -0,0 +1,267 @@
+import sys
+import csv
+import json
+import argparse
+import itertools
+
+from backends import TASK_FILE
+from search_index import fold
+from storage import SnapshotReader, dump_snapshot
+from task_engine import TaskEngine
+from task_model import DEFAULT_PRIORITY, PRIORITIES, Task, new_task_id, parse_due_date
+
+# Bulk import and export of tasks.
+#
+# Records are read from CSV (a header row naming the columns text,
+# due_date, priority and completed), JSON Lines (one task object or plain
+# string per line) or a JSON array like the task file itself, a batch at a
+# time. Each batch is validated together, bad records are reported with
+# their line number and the good ones are added to the task file with a
+# single save at the end. Imported tasks get new ids, ids in the records
+# are not used.
+#
+#   python bulk.py import tasks.csv
+#   python bulk.py export backup.jsonl
+
+BATCH_SIZE = 10000
+FIELDS = ("text", "due_date", "priority", "completed")
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "json"}
+
+# Completed values, folded like search words so that Turkish capitals
+# (HAYIR, EVET) match too
+TRUE_VALUES = {"1", "true", "yes", "evet", "x"}
+FALSE_VALUES = {"", "0", "false", "no", "hayir"}
+
+# Rejected records printed when they are not written to an error file
+SHOWN_ERRORS = 20
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    for extension, name in FORMATS.items():
+        if path.lower().endswith(extension):
+            return name
+    raise ValueError(f"Unknown file format, use --format: {path}")
+
+
+def open_text(path, mode):
+    """Open a file for csv/json text I/O, "-" is stdin or stdout"""
+    if path == "-":
+        return open((sys.stdin if "r" in mode else sys.stdout).fileno(), mode,
+                    encoding="utf-8", newline="", closefd=False)
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def read_records(file, fmt):
+    """Yield (line number, record, error) for every record of a file
+
+    Records of a JSON array are numbered by their position in the array.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(file)
+        for record in reader:
+            yield reader.line_num, record, None
+        return
+
+    if fmt == "json":
+        # Streamed like the task file, a broken array stops the import
+        for number, record in enumerate(SnapshotReader(file.name).parse(file.buffer), 1):
+            yield number, record, None
+        return
+
+    for line_number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line), None
+        except ValueError as e:
+            yield line_number, None, f"invalid JSON: {e}"
+
+
+def parse_completed(value):
+    """True or False for a completed value, None if it is not one
+
+    >>> [parse_completed(value) for value in ("EVET", "Evet", "HAYIR", "Hayır", "hayır", "İptal")]
+    [True, True, False, False, False, None]
+    """
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return False
+    folded = fold(str(value).strip())
+    if folded in TRUE_VALUES:
+        return True
+    if folded in FALSE_VALUES:
+        return False
+    return None
+
+
+def clean(value):
+    """Stripped string of a field, "" when missing, None if it is not text"""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value.strip()
+    return None
+
+
+def validate_batch(batch):
+    """Split a batch of read records into (task dicts, [(line, error, record)])"""
+    rows = []
+    errors = []
+    for line, record, error in batch:
+        if error is None:
+            # Old console files store plain strings
+            if isinstance(record, str):
+                record = {"text": record}
+            elif not isinstance(record, dict):
+                error = "not a task object"
+        if error is None:
+            rows.append((line, record, clean(record.get("due_date")), clean(record.get("priority"))))
+        else:
+            errors.append((line, error, record))
+
+    # Dates and priorities repeat a lot, each distinct value is checked once
+    valid_dates = {due_date: parse_due_date(due_date)[0] is not None for _, _, due_date, _ in rows if due_date}
+    valid_priorities = {priority: priority.lower() in PRIORITIES for _, _, _, priority in rows if priority}
+
+    tasks = []
+    for line, record, due_date, priority in rows:
+        text = clean(record.get("text"))
+        if not text:
+            errors.append((line, "missing task text", record))
+        elif due_date is None or (due_date and not valid_dates[due_date]):
+            errors.append((line, f"invalid due date {record.get('due_date')!r}, use YYYY-MM-DD", record))
+        elif priority is None or (priority and not valid_priorities[priority]):
+            errors.append((line, f"unknown priority {record.get('priority')!r}", record))
+        elif parse_completed(record.get("completed")) is None:
+            errors.append((line, f"invalid completed value {record.get('completed')!r}", record))
+        else:
+            tasks.append({
+                "id": new_task_id(),
+                "text": text,
+                "due_date": due_date or None,
+                "priority": priority.lower() if priority else DEFAULT_PRIORITY,
+                "completed": parse_completed(record.get("completed"))
+            })
+    errors.sort(key=lambda error: error[0])
+    return tasks, errors
+
+
+def import_tasks(source, task_file=None, fmt=None, batch_size=BATCH_SIZE, strict=False):
+    """Add the valid records of a CSV, JSON Lines or JSON file to the task file
+
+    Returns (number of tasks added, [(line, error, record)]). Nothing is
+    saved when strict is set and a record is invalid.
+    """
+    task_file = task_file or TASK_FILE
+    fmt = detect_format(source, fmt)
+    new_tasks = []
+    errors = []
+    with open_text(source, "r") as file:
+        records = read_records(file, fmt)
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                break
+            tasks, batch_errors = validate_batch(batch)
+            new_tasks.extend(tasks)
+            errors.extend(batch_errors)
+
+    if not new_tasks or (strict and errors):
+        return 0, errors
+
+    # One save for the whole import
+    engine = TaskEngine(task_file)
+    try:
+        tasks = [Task.from_dict(task) for task in new_tasks]
+        if engine.paged:
+            engine.append(tasks)
+        else:
+            engine.load()
+            for task in tasks:
+                engine.add(task)
+            # Tasks saved by others meanwhile are merged in, not overwritten
+            engine.save()
+    finally:
+        engine.close()
+    return len(new_tasks), errors
+
+
+def export_tasks(target, task_file=None, fmt=None):
+    """Write every task to a CSV, JSON Lines or JSON file, return the count"""
+    task_file = task_file or TASK_FILE
+    fmt = detect_format(target, fmt)
+    engine = TaskEngine(task_file)
+    try:
+        engine.load(migrate=False)
+        items = list(engine.items().values())
+    finally:
+        engine.close()
+
+    with open_text(target, "w") as file:
+        if fmt == "csv":
+            writer = csv.writer(file)
+            writer.writerow(FIELDS)
+            for item in items:
+                writer.writerow([
+                    item.get("text"), item.get("due_date") or "",
+                    item.get("priority") or "", "true" if item.get("completed") is True else "false"
+                ])
+        elif fmt == "json":
+            # Same layout as the task file, so an export can be opened as one
+            file.write(dump_snapshot(items).decode("utf-8") + "\n")
+        else:
+            for item in items:
+                file.write(json.dumps(item, ensure_ascii=False) + "\n")
+    return len(items)
+
+
+def report_errors(errors, errors_file=None):
+    if errors_file:
+        with open_text(errors_file, "w") as file:
+            for line, error, record in errors:
+                file.write(json.dumps({"line": line, "error": error, "record": record}, ensure_ascii=False) + "\n")
+        return
+
+    for line, error, record in errors[:SHOWN_ERRORS]:
+        print(f"line {line}: {error}", file=sys.stderr)
+    if len(errors) > SHOWN_ERRORS:
+        print(f"... {len(errors) - SHOWN_ERRORS} more, list them all with --errors FILE", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import and export tasks in bulk")
+    parser.add_argument("--file", help="task file (default: TODO_TASK_FILE or tasks.json)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="add tasks from a CSV, JSON Lines or JSON file")
+    import_parser.add_argument("source", help='file to read, "-" for stdin')
+    import_parser.add_argument("--format", choices=("csv", "jsonl", "json"))
+    import_parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    import_parser.add_argument("--strict", action="store_true", help="save nothing if a record is invalid")
+    import_parser.add_argument("--errors", help="write every rejected record to this JSON Lines file")
+
+    export_parser = subparsers.add_parser("export", help="write all tasks to a CSV, JSON Lines or JSON file")
+    export_parser.add_argument("target", help='file to write, "-" for stdout')
+    export_parser.add_argument("--format", choices=("csv", "jsonl", "json"))
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "import":
+            count, errors = import_tasks(args.source, args.file, args.format, args.batch_size, args.strict)
+            report_errors(errors, args.errors)
+            print(f"{count} tasks imported, {len(errors)} rejected", file=sys.stderr)
+            return 1 if errors else 0
+
+        count = export_tasks(args.target, args.file, args.format)
+        print(f"{count} tasks exported", file=sys.stderr)
+        return 0
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,344 @@
+import json
+import time
+import threading
+
+from storage import apply_operation, file_stamp, keyed_items, keyed_operation
+from task_model import assign_ids
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
+# Sharing a task file between processes.
+#
+# The console, the GUI and the command line can run against the same file
+# at once. Every process keeps the stamp of the file (size, mtime and inode
+# of the snapshot and the journal) and a hash of each task, by id, as it
+# last read or wrote them. A write takes a short lock and checks the stamp
+# first. If another process only appended journal records for other tasks
+# in between, they are taken in and the new records appended after them.
+# Otherwise the file is read again and the changes of both sides are merged
+# task by task (merge_items) before writing, so neither side silently drops
+# the other's changes. Reads never lock, and the lock is only held while
+# checking the stamp and replacing or appending to the file.
+
+LOCK_SUFFIX = ".lock"
+
+# Seconds between attempts to take a lock held by another process, where
+# the platform cannot wait for it
+LOCK_RETRY = 0.01
+
+
+class ConflictError(Exception):
+    """The task file was saved by another process since it was last read"""
+
+
+class FileLock:
+    """Exclusive lock on a task file between processes and threads, reentrant in one thread"""
+
+    def __init__(self, file_name):
+        self.path = file_name + LOCK_SUFFIX
+        self._file = None
+        self._depth = 0  # Nesting of the thread that holds the lock
+        # Other threads of the process wait here, the file lock would not
+        # keep them out of a lock their process already holds
+        self._thread_lock = threading.RLock()
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._file = open(self.path, "a+b")
+                self._lock()
+            except BaseException:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        try:
+            if self._depth == 0:
+                try:
+                    self._unlock()
+                finally:
+                    self._file.close()
+                    self._file = None
+        finally:
+            self._thread_lock.release()
+
+    def _lock(self):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            # Locks the first byte, waiting in small steps
+            self._file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+                    return
+                except OSError:
+                    time.sleep(LOCK_RETRY)
+
+    def _unlock(self):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        elif msvcrt is not None:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def item_key(item):
+    """Hash of a saved item, equal items have equal keys"""
+    if isinstance(item, str):
+        return hash(item)
+    try:
+        return hash(tuple(item.items()))
+    except TypeError:
+        # Unhashable values such as lists
+        return hash(json.dumps(item, sort_keys=True))
+
+
+def item_keys(items):
+    """{id: item key} of items ({id: item})"""
+    return {task_id: item_key(item) for task_id, item in items.items()}
+
+
+def merge_items(base_keys, ours, theirs):
+    """Three-way merge of two {id: item} dicts changed from the same base
+
+    Changes made on one side only are kept. When both sides changed the
+    same task, our version wins, and an edit wins over a delete so that no
+    edit is lost; each such task counts as a conflict. Tasks keep their
+    order in theirs, which was saved first, and ours added since follow.
+    Returns (merged items, number of conflicts).
+    """
+    merged = {}
+    conflicts = 0
+    for task_id, item in theirs.items():
+        base = base_keys.get(task_id)
+        mine = ours.get(task_id)
+        if mine is None:
+            # Deleted by us unless it is new, an edit of theirs brings it back
+            if base is None or item_key(item) != base:
+                merged[task_id] = item
+                conflicts += base is not None
+            continue
+        our_key = item_key(mine)
+        if our_key == base:
+            merged[task_id] = item
+            continue
+        merged[task_id] = mine
+        their_key = item_key(item)
+        if their_key != base and their_key != our_key:
+            conflicts += 1
+
+    for task_id, item in ours.items():
+        if task_id in theirs:
+            continue
+        base = base_keys.get(task_id)
+        if base is None:
+            merged[task_id] = item
+        elif item_key(item) != base:
+            # Deleted by them after our edit
+            merged[task_id] = item
+            conflicts += 1
+    return merged, conflicts
+
+
+class SharedTaskFile:
+    """A task file and its journal, read and written alongside other processes
+
+    Items are dicts from task id to saved item. load() and read() never
+    lock. save() and append() lock the file for the check and the write
+    only. save() merges changes saved by others into the items. append()
+    takes in records others appended to the journal and raises
+    ConflictError for anything else, so that the caller can merge and save.
+    """
+
+    def __init__(self, backend, journal):
+        self.backend = backend
+        self.journal = journal
+        self.file_name = backend.file_name
+        self.lock = FileLock(self.file_name)
+        self.stamp = None
+        self.base_keys = {}
+        self.merges = 0
+        self.conflicts = 0
+
+    def changed(self):
+        """True when the file was saved by someone else since it was last read"""
+        return file_stamp(self.file_name) != self.stamp
+
+    def read(self):
+        """(items, stamp) of the file with its journal applied"""
+        items, stamp, migrated = self._read()
+        return items, stamp
+
+    def _read(self):
+        while True:
+            stamp = file_stamp(self.file_name)
+            items, token = self.backend.read_all()
+            by_id = keyed_items(items)
+            migrated = by_id is None
+            if migrated:
+                # Saved before tasks had ids, the journal holds positions
+                by_id = keyed_items(assign_ids(self.journal.replay(items, token)))
+            else:
+                self.journal.replay(by_id, token)
+            # Read again if a save finished while reading
+            if file_stamp(self.file_name) == stamp:
+                return by_id, stamp, migrated
+
+    def load(self):
+        while True:
+            items, stamp, migrated = self._read()
+            if not migrated:
+                self.loaded(items, stamp)
+                return items
+            # The new ids are saved at once, so that every program uses the
+            # same ones, unless another program saved the file meanwhile
+            with self.lock:
+                if file_stamp(self.file_name) == stamp:
+                    self.stamp = stamp
+                    return self.save(items, merge=False)
+
+    def loaded(self, items, stamp, keys=None):
+        """Remember the items read from the file when it had stamp
+
+        keys are the item_keys() of items, if they are already known.
+        """
+        self.stamp = stamp
+        self.base_keys = item_keys(items) if keys is None else keys
+
+    def appended(self):
+        """Journal records others appended since the last read or write
+
+        None when more than the journal changed, reload() then reads it all.
+        Every record returned has the id of its task, also those of
+        programs that still write positions.
+        """
+        taken = self._take_appended()
+        return None if taken is None else taken[0]
+
+    def _take_appended(self):
+        """(appended records, {id: key before them}) or None, see appended()"""
+        stamp = file_stamp(self.file_name)
+        old = self.stamp
+        if old is None or stamp[0] != old[0] or stamp[1] is None:
+            return None
+        if old[1] is not None and (stamp[1][2] != old[1][2] or stamp[1][0] < old[1][0]):
+            return None
+        ops = self.journal.follow()
+        if ops is None:
+            return None
+        keyed = []
+        previous = {}
+        for op in ops:
+            # Positions count the tasks as the records before left them
+            op = keyed_operation(self.base_keys, op)
+            if op["id"] not in previous:
+                previous[op["id"]] = self.base_keys.get(op["id"])
+            apply_operation(self.base_keys, op, item_key)
+            keyed.append(op)
+        # Records appended after the stat are read too, the next check
+        # finds no new ones
+        self.stamp = stamp
+        return keyed, previous
+
+    def reload(self):
+        """Read the whole file again, return (items, ids of unchanged items)
+
+        Unchanged items are those equal to the last read or write, their
+        tasks can be kept.
+        """
+        items, stamp = self.read()
+        keys = item_keys(items)
+        base_keys = self.base_keys
+        unchanged = {task_id for task_id, key in keys.items() if base_keys.get(task_id) == key}
+        self.stamp = stamp
+        self.base_keys = keys
+        return items, unchanged
+
+    def merge(self, items):
+        """Merge items, changed since the last read or write, with the file
+
+        The file becomes the new base, so saving the result writes both
+        sides' changes.
+        """
+        theirs, stamp = self.read()
+        merged, conflicts = merge_items(self.base_keys, items, theirs)
+        self.loaded(theirs, stamp)
+        self.merges += 1
+        self.conflicts += conflicts
+        return merged
+
+    def save(self, items, merge=True):
+        """Write all items and return what was written
+
+        If the file changed since it was last read, the result is items
+        merged with those changes, or ConflictError with merge set to False.
+        """
+        # Encoded and written aside before taking the lock, which is then
+        # only held to check the stamp and replace the file
+        pending = self.backend.prepare(list(items.values()))
+        keys = item_keys(items)
+        try:
+            with self.lock:
+                if self.changed():
+                    if not merge:
+                        raise ConflictError(self.file_name)
+                    pending.discard()
+                    items = self.merge(items)
+                    keys = None
+                    pending = self.backend.prepare(list(items.values()))
+                token = pending.commit()
+                self.journal.reset(token)
+                self.loaded(items, file_stamp(self.file_name), keys)
+        except BaseException:
+            pending.discard()
+            raise
+        return items
+
+    def append(self, ops):
+        """Append journal records, return (records of others, True when compaction is due)
+
+        Records others appended since the last read or write are written
+        before ops and returned, so that the caller can apply them too.
+        Raises ConflictError instead when the file was rewritten or both
+        sides changed the same task, only merge() can reconcile those.
+        """
+        with self.lock:
+            theirs = []
+            if self.changed():
+                stamp = self.stamp
+                taken = self._take_appended()
+                if taken is None:
+                    raise ConflictError(self.file_name)
+                theirs, previous = taken
+                if any(op["id"] in previous for op in ops):
+                    # Back to the last read, merge() needs it as the base
+                    for task_id, key in previous.items():
+                        if key is None:
+                            self.base_keys.pop(task_id, None)
+                        else:
+                            self.base_keys[task_id] = key
+                    self.stamp = stamp
+                    raise ConflictError(self.file_name)
+            due = self.journal.extend(ops)
+            self.stamp = file_stamp(self.file_name)
+        for op in ops:
+            apply_operation(self.base_keys, op, item_key)
+        return theirs, due
+
+    def close(self):
+        self.journal.close()
@@ -0,0 +1,146 @@
+import os
+import sys
+import struct
+
+# Noticing changes other programs make to the task file.
+#
+# On Linux the directory of the task file is watched with inotify and the
+# Tk event loop wakes up when one of the watched files is written, renamed
+# into place or removed. Elsewhere, or when inotify cannot be used, the
+# files are checked with os.stat every POLL_INTERVAL_MS from root.after.
+# Either way the callback only learns that something may have changed, it
+# decides itself what to read again.
+
+# "auto" uses inotify when it can, "poll" always polls, "off" does not watch
+WATCH_MODE = os.environ.get("TODO_WATCH", "auto")
+POLL_INTERVAL_MS = int(os.environ.get("TODO_POLL_INTERVAL_MS", "1000"))
+
+# Bursts of writes (a save, many journal appends) give one callback
+SETTLE_MS = 50
+
+# inotify event flags, from <sys/inotify.h>
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+IN_EVENT = struct.Struct("iIII")
+
+
+def open_inotify(directory):
+    """A non-blocking inotify descriptor watching directory, None if unavailable"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return None
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+def changed_names(data):
+    """File names in a buffer of inotify events"""
+    names = set()
+    offset = 0
+    while offset + IN_EVENT.size <= len(data):
+        wd, mask, cookie, length = IN_EVENT.unpack_from(data, offset)
+        offset += IN_EVENT.size
+        names.add(os.fsdecode(data[offset:offset + length].rstrip(b"\0")))
+        offset += length
+    return names
+
+
+class FileWatcher:
+    """Call callback from the Tk event loop when one of paths may have changed"""
+
+    def __init__(self, root, paths, callback, mode=None, interval_ms=None):
+        self.root = root
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.names = {os.path.basename(path) for path in self.paths}
+        self.callback = callback
+        self.mode = mode or WATCH_MODE
+        self.interval_ms = interval_ms or POLL_INTERVAL_MS
+        self.fd = None
+        self.poll_job = None
+        self.settle_job = None
+        self.stamps = None
+
+    @property
+    def watching(self):
+        """How changes are noticed: "inotify", "poll" or None"""
+        if self.fd is not None:
+            return "inotify"
+        return "poll" if self.poll_job is not None else None
+
+    def start(self):
+        if self.mode == "off":
+            return
+        if self.mode == "auto":
+            # Tk can only wait on descriptors on Unix
+            create = getattr(self.root.tk, "createfilehandler", None)
+            if create is not None:
+                self.fd = open_inotify(os.path.dirname(self.paths[0]))
+            if self.fd is not None:
+                import tkinter
+
+                create(self.fd, tkinter.READABLE, self.on_events)
+                return
+        self.stamps = self.stat()
+        self.poll_job = self.root.after(self.interval_ms, self.poll)
+
+    def stop(self):
+        if self.fd is not None:
+            self.root.tk.deletefilehandler(self.fd)
+            os.close(self.fd)
+            self.fd = None
+        for job in (self.poll_job, self.settle_job):
+            if job is not None:
+                self.root.after_cancel(job)
+        self.poll_job = self.settle_job = None
+
+    def stat(self):
+        stamps = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                stamps.append((stat.st_size, stat.st_mtime_ns, stat.st_ino))
+            except OSError:
+                stamps.append(None)
+        return stamps
+
+    def poll(self):
+        self.poll_job = self.root.after(self.interval_ms, self.poll)
+        stamps = self.stat()
+        if stamps != self.stamps:
+            self.stamps = stamps
+            self.callback()
+
+    def on_events(self, fd, mask):
+        # Read every queued event, the directory also sees temporary files
+        names = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            names |= changed_names(data)
+        if names & self.names and self.settle_job is None:
+            self.settle_job = self.root.after(SETTLE_MS, self.settled)
+
+    def settled(self):
+        self.settle_job = None
+        self.callback()
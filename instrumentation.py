@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import atexit
+import functools
+import threading
+import contextlib
+
+# Opt-in timings of the hot paths of both versions.
+#
+# Set TODO_STATS=1 to record how often each instrumented function or block
+# runs and how long it takes, or TODO_STATS=<file> to choose where the JSON
+# dump is written (todo_stats.json by default). The dump is written at exit
+# and from the stats view of the GUI (F12) or the console (menu 7), which
+# can also capture a cProfile or tracemalloc snapshot on demand.
+#
+# The switch is read once at import. When it is off, timed() returns the
+# function itself and measure() a shared no-op context, so instrumented code
+# runs as if it was not instrumented.
+
+STATS_SETTING = os.environ.get("TODO_STATS", "")
+ENABLED = STATS_SETTING not in ("", "0")
+STATS_FILE = STATS_SETTING if ENABLED and STATS_SETTING != "1" else "todo_stats.json"
+
+# Lines of the profile and memory reports shown in the stats views
+REPORT_LINES = 15
+
+_disabled = contextlib.nullcontext()
+
+
+class Stats:
+    """Call counts and durations per name, safe to record from any thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # name -> [count, total seconds, max seconds]
+
+    def record(self, name, seconds):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                self._entries[name] = [1, seconds, seconds]
+                return
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+
+    def snapshot(self):
+        """{name: {count, total_ms, mean_ms, max_ms}}, slowest total first"""
+        with self._lock:
+            entries = sorted(self._entries.items(), key=lambda item: -item[1][1])
+        return {
+            name: {
+                "count": count,
+                "total_ms": round(total * 1000, 3),
+                "mean_ms": round(total * 1000 / count, 3),
+                "max_ms": round(longest * 1000, 3)
+            }
+            for name, (count, total, longest) in entries
+        }
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+
+    def format(self):
+        """The snapshot as a text table"""
+        lines = [f"{'name':<34}{'count':>8}{'total ms':>12}{'mean ms':>10}{'max ms':>10}"]
+        for name, entry in self.snapshot().items():
+            lines.append(
+                f"{name:<34}{entry['count']:>8}{entry['total_ms']:>12.1f}"
+                f"{entry['mean_ms']:>10.2f}{entry['max_ms']:>10.1f}"
+            )
+        return "\n".join(lines)
+
+    def dump(self, file_name=None):
+        """Write the snapshot as JSON, return the file name"""
+        file_name = file_name or STATS_FILE
+        with open(file_name, "w", encoding="utf-8") as file:
+            json.dump({"time": time.time(), "stats": self.snapshot()}, file, indent=2)
+        return file_name
+
+
+stats = Stats()
+
+
+def timed(name):
+    """Decorator recording the duration of each call under name"""
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+@contextlib.contextmanager
+def _measure(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.record(name, time.perf_counter() - start)
+
+
+def measure(name):
+    """Context manager recording the duration of a block under name"""
+    return _measure(name) if ENABLED else _disabled
+
+
+def output_file(suffix):
+    """File next to the stats dump for a profile or memory report"""
+    return os.path.splitext(STATS_FILE)[0] + suffix
+
+
+class Profiler:
+    """cProfile of everything that runs between start() and stop()"""
+
+    def __init__(self):
+        self.profile = None
+
+    @property
+    def running(self):
+        return self.profile is not None
+
+    def start(self):
+        # Only imported when a profile is asked for. pstats is imported
+        # before profiling starts so that the import is not part of it
+        import pstats
+        import cProfile
+
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self):
+        """Stop profiling, save the profile and return the top functions"""
+        self.profile.disable()
+        import io
+        import pstats
+
+        file_name = output_file(".prof")
+        self.profile.dump_stats(file_name)
+        report = io.StringIO()
+        pstats.Stats(self.profile, stream=report).sort_stats("cumulative").print_stats(REPORT_LINES)
+        self.profile = None
+        return f"{file_name}\n{report.getvalue()}"
+
+
+profiler = Profiler()
+
+
+def memory_snapshot():
+    """Start tracing allocations, or report the largest ones since the start"""
+    import tracemalloc
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        return None
+    snapshot = tracemalloc.take_snapshot()
+    file_name = output_file(".memory")
+    snapshot.dump(file_name)
+    current, peak = tracemalloc.get_traced_memory()
+    lines = [file_name, f"current {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB"]
+    lines.extend(str(stat) for stat in snapshot.statistics("lineno")[:REPORT_LINES])
+    return "\n".join(lines)
+
+
+def _dump_at_exit():
+    try:
+        stats.dump()
+    except OSError:
+        pass
+
+
+if ENABLED:
+    atexit.register(_dump_at_exit)
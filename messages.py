@@ -0,0 +1,142 @@
+# Messages of the console and the GUI, one dictionary per language.
+#
+# Both front-ends use the same dictionaries, so a message is translated
+# once. Keys only one front-end shows sit next to the shared ones.
+
+TURKISH = {
+    "app_title": "Görev Yönetim Uygulaması",
+    "menu_list": "1. Görevleri Listele",
+    "menu_add": "2. Yeni Görev Ekle",
+    "menu_edit": "3. Görev Düzenle",
+    "menu_delete": "4. Görev Sil",
+    "menu_language": "5. Dil Değiştir / Change Language",
+    "menu_exit": "6. Çıkış",
+    "menu_choice": "Seçiminizi yapın: ",
+    "invalid_choice": "Geçersiz seçim! Lütfen tekrar deneyin.",
+    "no_tasks": "Hiç görev bulunamadı!",
+    "enter_task": "Görev metni: ",
+    "empty_task": "Boş görev eklenemez!",
+    "task_added": "Görev eklendi.",
+    "enter_task_num": "Görev numarası: ",
+    "invalid_task_num": "Geçersiz görev numarası!",
+    "enter_new_task": "Yeni görev metni: ",
+    "task_edited": "Görev düzenlendi.",
+    "task_deleted": "Görev silindi.",
+    "file_error": "Dosya işlemi sırasında bir hata oluştu: ",
+    "goodbye": "Programdan çıkılıyor. Hoşçakalın!",
+    "lang_changed": "Dil İngilizce olarak değiştirildi.",
+    "menu_stats": "7. İstatistikler",
+    "stats_choice": "p: profili başlat/durdur, m: bellek görüntüsü, s: JSON kaydet, Enter: geri: ",
+    "memory_tracing": "Bellek izleniyor, görüntü almak için tekrar seçin.",
+    "profile_started": "Profil başlatıldı.",
+    "stats_saved": "İstatistikler kaydedildi: ",
+    "file_reloaded": "Görev dosyası başka bir program tarafından değiştirildi, yeniden yüklendi.",
+    "changes_merged": "Görev dosyası başka bir program tarafından da değiştirildi. Değişiklikler birleştirildi, aynı görevlerde sizin sürümünüz korundu.",
+    "task_list": "Görev Listesi",
+    "add_task": "Görev Ekle",
+    "edit_task": "Düzenle",
+    "delete_task": "Sil",
+    "task_entry_label": "Görev Metni:",
+    "due_date_label": "Son Tarih (YYYY-MM-DD):",
+    "priority_label": "Öncelik:",
+    "add_button": "Ekle",
+    "edit_button": "Düzenle",
+    "delete_button": "Sil",
+    "change_lang": "İngilizce'ye Geç",
+    "select_task": "Lütfen bir görev seçin.",
+    "confirm_delete": "Silme Onayı",
+    "confirm_delete_msg": "Bu görevi silmek istediğinizden emin misiniz?",
+    "yes": "Evet",
+    "no": "Hayır",
+    "completed": "Tamamlandı",
+    "sort_by": "Sıralama:",
+    "sort_by_name": "İsim",
+    "sort_by_priority": "Öncelik",
+    "sort_by_date": "Tarih",
+    "low_priority": "Düşük",
+    "medium_priority": "Orta",
+    "high_priority": "Yüksek",
+    "invalid_date": "Geçersiz tarih formatı! YYYY-MM-DD formatını kullanın.",
+    "search": "Ara:",
+    "filter": "Filtre:",
+    "hide_completed": "Tamamlananları gizle",
+    "all_priorities": "Tüm öncelikler",
+    "all_dates": "Tüm tarihler",
+    "overdue": "Süresi geçmiş",
+    "due_week": "Önümüzdeki 7 gün",
+    "stats_title": "İstatistikler",
+    "refresh": "Yenile",
+    "start_profile": "Profili Başlat",
+    "stop_profile": "Profili Durdur",
+    "memory_snapshot": "Bellek Görüntüsü",
+    "save_stats": "JSON Kaydet"
+}
+
+ENGLISH = {
+    "app_title": "Task Management Application",
+    "menu_list": "1. List Tasks",
+    "menu_add": "2. Add New Task",
+    "menu_edit": "3. Edit Task",
+    "menu_delete": "4. Delete Task",
+    "menu_language": "5. Change Language / Dil Değiştir",
+    "menu_exit": "6. Exit",
+    "menu_choice": "Enter your choice: ",
+    "invalid_choice": "Invalid choice! Please try again.",
+    "no_tasks": "No tasks found!",
+    "enter_task": "Task text: ",
+    "empty_task": "Cannot add empty task!",
+    "task_added": "Task added.",
+    "enter_task_num": "Task number: ",
+    "invalid_task_num": "Invalid task number!",
+    "enter_new_task": "New task text: ",
+    "task_edited": "Task edited.",
+    "task_deleted": "Task deleted.",
+    "file_error": "An error occurred during file operation: ",
+    "goodbye": "Exiting program. Goodbye!",
+    "lang_changed": "Language changed to Turkish.",
+    "menu_stats": "7. Statistics",
+    "stats_choice": "p: start/stop profile, m: memory snapshot, s: save JSON, Enter: back: ",
+    "memory_tracing": "Tracing memory, choose it again for a snapshot.",
+    "profile_started": "Profile started.",
+    "stats_saved": "Statistics saved to ",
+    "file_reloaded": "The task file was changed by another program and has been reloaded.",
+    "changes_merged": "The task file was also changed by another program. The changes were merged, your version of tasks changed by both was kept.",
+    "task_list": "Task List",
+    "add_task": "Add Task",
+    "edit_task": "Edit",
+    "delete_task": "Delete",
+    "task_entry_label": "Task Text:",
+    "due_date_label": "Due Date (YYYY-MM-DD):",
+    "priority_label": "Priority:",
+    "add_button": "Add",
+    "edit_button": "Edit",
+    "delete_button": "Delete",
+    "change_lang": "Switch to Turkish",
+    "select_task": "Please select a task.",
+    "confirm_delete": "Delete Confirmation",
+    "confirm_delete_msg": "Are you sure you want to delete this task?",
+    "yes": "Yes",
+    "no": "No",
+    "completed": "Completed",
+    "sort_by": "Sort by:",
+    "sort_by_name": "Name",
+    "sort_by_priority": "Priority",
+    "sort_by_date": "Date",
+    "low_priority": "Low",
+    "medium_priority": "Medium",
+    "high_priority": "High",
+    "invalid_date": "Invalid date format! Please use YYYY-MM-DD format.",
+    "search": "Search:",
+    "filter": "Filter:",
+    "hide_completed": "Hide completed",
+    "all_priorities": "All priorities",
+    "all_dates": "All dates",
+    "overdue": "Overdue",
+    "due_week": "Next 7 days",
+    "stats_title": "Statistics",
+    "refresh": "Refresh",
+    "start_profile": "Start Profile",
+    "stop_profile": "Stop Profile",
+    "memory_snapshot": "Memory Snapshot",
+    "save_stats": "Save JSON"
+}
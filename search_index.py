@@ -0,0 +1,300 @@
+import re
+import heapq
+import itertools
+import operator
+
+from task_index import SortedKeyList
+
+# Full-text search over task texts.
+#
+# Texts are split into words which are case folded so that the Turkish
+# dotted and dotless i (İ i I ı) all match each other, whatever the case
+# rules of the language a task was typed in. Every word of a query matches
+# as a prefix, and a task must match all words of the query.
+#
+# Search runs on every keystroke. A prefix of one or two letters covers a
+# large share of the vocabulary, so the union of its postings is kept once
+# made and updated with the index. A query that extends the previous one
+# can only match tasks the previous one matched, which it starts from.
+
+_WORD = re.compile(r"\w+")
+
+# Longest prefix whose union of postings is kept
+SHORT_PREFIX = 2
+
+# Small result sets are sorted at once, large ones are collected by walking
+# the sort index as rows are shown. Switching at sqrt(factor * tasks) ids
+# keeps either cost near sqrt(tasks) per screen of rows
+DIRECT_SORT_FACTOR = 64
+SCAN_CHUNK = 4096
+
+# Keys of the sort index walked for the price of looking up the key of one
+# match. Matches cluster in the sort order, so a walk may pass most of the
+# index before it finds a screen of them. Once it has cost as much as
+# looking up every match would, the first SELECT_ROWS matches are picked
+# from their keys instead, SELECT_CHUNK matches a step, and all of them
+# sorted only if more rows are needed. A first screen then costs at most
+# about twice the cheaper way
+SCAN_KEYS_PER_MATCH = 4
+SELECT_ROWS = 256
+SELECT_CHUNK = 1024
+
+_task_id = operator.itemgetter(-1)
+
+
+def fold(text):
+    """Case fold text for searching"""
+    # "İ".lower() would leave a combining dot above behind. Chained
+    # replace() is several times faster than translate() with a dict
+    text = text.replace("İ", "i").replace("I", "i").replace("ı", "i").casefold()
+    if "\u0307" in text:
+        text = text.replace("\u0307", "")
+    return text
+
+
+def tokenize(text):
+    """Distinct folded words of a text, in order"""
+    text = fold(text)
+    words = text.split()
+    # Most texts are plain words separated by spaces, which split() finds
+    # without the regular expression
+    if not all(map(str.isalnum, words)):
+        words = _WORD.findall(text)
+    return tuple(dict.fromkeys(words))
+
+
+class SearchIndex:
+    """Inverted index from folded words to the ids of the tasks using them
+
+    A word used by a single task maps to a one-item tuple, otherwise to a
+    set of ids, so a range of words can be merged with one set.union().
+    The sorted vocabulary turns a prefix into that range of words.
+    Like the sort indexes, remove(task) needs the text the task was added
+    with.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.vocabulary = SortedKeyList()
+        self.short_prefixes = {}  # Ids by prefix of up to SHORT_PREFIX letters
+
+    def build(self, tasks):
+        self.postings = {}
+        self.vocabulary.reset([])
+        self.short_prefixes = {}
+        self.extend(tasks)
+
+    def extend(self, tasks):
+        """Add many tasks at once, cheaper than add for large batches"""
+        postings = self.postings
+        new_words = []
+        for task in tasks:
+            words = tokenize(task.text)
+            for word in words:
+                ids = postings.get(word)
+                if ids is None:
+                    postings[word] = (task.id,)
+                    new_words.append(word)
+                elif type(ids) is set:
+                    ids.add(task.id)
+                else:
+                    postings[word] = {ids[0], task.id}
+            if self.short_prefixes:
+                self._short_prefix_sets(words, set.add, task.id)
+        self.vocabulary.update(new_words)
+
+    def _short_prefix_sets(self, words, change, task_id):
+        """Apply change (set.add or set.discard) to the kept unions of words"""
+        short_prefixes = self.short_prefixes
+        for word in words:
+            for length in range(1, SHORT_PREFIX + 1):
+                ids = short_prefixes.get(word[:length])
+                if ids is not None:
+                    change(ids, task_id)
+
+    def add(self, task):
+        postings = self.postings
+        words = tokenize(task.text)
+        if self.short_prefixes:
+            self._short_prefix_sets(words, set.add, task.id)
+        for word in words:
+            ids = postings.get(word)
+            if ids is None:
+                postings[word] = (task.id,)
+                self.vocabulary.add(word)
+            elif type(ids) is set:
+                ids.add(task.id)
+            else:
+                postings[word] = {ids[0], task.id}
+
+    def remove(self, task):
+        postings = self.postings
+        words = tokenize(task.text)
+        if self.short_prefixes:
+            self._short_prefix_sets(words, set.discard, task.id)
+        for word in words:
+            ids = postings[word]
+            if type(ids) is not set:
+                del postings[word]
+                self.vocabulary.remove(word)
+                continue
+            ids.discard(task.id)
+            if len(ids) == 1:
+                postings[word] = tuple(ids)
+
+    def prefix_range(self, prefix):
+        """Rows of the vocabulary that start with prefix"""
+        start = self.vocabulary.bisect_left(prefix)
+        stop = self.vocabulary.bisect_left(prefix + "\U0010ffff")
+        return start, stop
+
+    def prefix_ids(self, prefix):
+        """Ids of the tasks with a word that starts with prefix
+
+        The set of a single matching word, and the kept union of a short
+        prefix, is returned as is, without a copy. It must not be changed,
+        and changes with the index.
+        """
+        short = len(prefix) <= SHORT_PREFIX
+        if short and prefix in self.short_prefixes:
+            return self.short_prefixes[prefix]
+        words = self.vocabulary.slice(*self.prefix_range(prefix))
+        if len(words) == 1 and type(self.postings[words[0]]) is set:
+            return self.postings[words[0]]
+        ids = set().union(*map(self.postings.__getitem__, words))
+        if short:
+            self.short_prefixes[prefix] = ids
+        return ids
+
+    def search(self, query, previous="", within=None):
+        """Ids of the tasks matching every word of query, None without words
+
+        When query extends the query previous, within may hold the ids that
+        one matched: only those can match again, and the words both share
+        are not looked up. Like prefix_ids, the result may be a set of the
+        index itself, or within.
+        """
+        words = tokenize(query)
+        if not words:
+            return None
+        shared = False
+        if within is not None:
+            # The words shared with previous only match within
+            known = set(tokenize(previous))
+            shared = not known.isdisjoint(words)
+            words = [word for word in words if word not in known]
+            if not words:
+                return within
+
+        # Intersect the smallest sets first, & only walks the smaller side
+        candidates = sorted(map(self.prefix_ids, words), key=len)
+        if within is not None and (shared or len(within) < len(candidates[0])):
+            candidates.insert(0, within)
+        result = candidates[0]
+        for ids in candidates[1:]:
+            if not result:
+                break
+            result = result & ids
+        return result
+
+
+class SearchResults:
+    """Matching task ids in the order of a sort index, found as rows are needed
+
+    id_at(row) scans the sort index as far as needed. Callers that must
+    not block, like drawing, check found(row) first and call scan() in
+    small steps themselves.
+    """
+
+    def __init__(self, index, ids, task_by_id, previous=None):
+        """previous may be the results of a search that ids narrow down"""
+        self.index = index
+        self.ids = ids
+        self.task_by_id = task_by_id
+        self.rows = []
+        self.scanned = 0
+        self.selecting = None  # Matches whose keys are not picked from yet
+        self.best = []  # Keys of the first matches picked so far
+        self.selected = False  # rows holds the first SELECT_ROWS matches
+        if len(ids) ** 2 <= DIRECT_SORT_FACTOR * len(index):
+            self.sort()
+        elif previous is not None and previous.index is index:
+            # The rows found so far hold all of the first matches
+            self.rows = list(filter(ids.__contains__, previous.rows))
+            self.scanned = previous.scanned
+            self.selected = previous.selected
+
+    def __len__(self):
+        return len(self.ids)
+
+    def scan(self):
+        """Walk the next chunk of the sort index, return False at its end"""
+        if self.scanned >= len(self.index):
+            return False
+        if self.selected or self.scanned >= SCAN_KEYS_PER_MATCH * len(self.ids):
+            # The rows after the selected ones are only found by sorting
+            if self.selected or len(self.rows) >= SELECT_ROWS or len(self.ids) <= SELECT_ROWS:
+                self.sort()
+            else:
+                self.select()
+            return True
+        keys = self.index.keys.slice(self.scanned, self.scanned + SCAN_CHUNK)
+        # Filtering runs in C, without a Python call per task
+        self.rows.extend(filter(self.ids.__contains__, map(_task_id, keys)))
+        self.scanned += SCAN_CHUNK
+        return True
+
+    def _key(self, task_id):
+        return self.index.key(self.task_by_id[task_id])
+
+    def select(self):
+        """Pick the first SELECT_ROWS rows from the keys of the next chunk of matches
+
+        The rows found by scanning stay until all matches are picked from.
+        """
+        if self.selecting is None:
+            self.selecting = iter(self.ids)
+        chunk = list(itertools.islice(self.selecting, SELECT_CHUNK))
+        keys = map(self.index.key, map(self.task_by_id.__getitem__, chunk))
+        self.best = heapq.nsmallest(SELECT_ROWS, itertools.chain(self.best, keys))
+        if len(chunk) < SELECT_CHUNK:
+            self.rows = list(map(_task_id, self.best))
+            self.selected = True
+            self.selecting = None
+            self.best = []
+
+    def sort(self):
+        """Find the rows of all matches at once, by sorting them"""
+        self.rows = sorted(self.ids, key=self._key)
+        self.scanned = len(self.index)
+
+    def found(self, row):
+        """True when the task of row is known without scanning"""
+        return row < len(self.rows)
+
+    def complete(self, rows):
+        """True when the first rows are known or there are no more to find"""
+        return len(self.rows) >= min(rows, len(self.ids))
+
+    def id_at(self, row):
+        while row >= len(self.rows):
+            if not self.scan():
+                raise IndexError("row out of range")
+        return self.rows[row]
+
+    def row_of(self, task_id):
+        """Row of a matching task, None if it does not match"""
+        if task_id not in self.ids:
+            return None
+        searched = 0
+        while True:
+            rows = self.rows
+            try:
+                return rows.index(task_id, searched)
+            except ValueError:
+                searched = len(rows)
+                if not self.scan():
+                    raise
+                if self.rows is not rows:
+                    # Picking and sorting replace the rows, scanning adds to them
+                    searched = 0
@@ -0,0 +1,375 @@
+import sys
+import json
+import sqlite3
+from collections import OrderedDict
+
+from backends import StorageBackend, convert_file
+from task_index import NO_DUE_DATE
+from task_model import DEFAULT_PRIORITY, PRIORITY_ORDER, Task, parse_due_date
+
+# SQLite task store.
+#
+# Tasks are rows of a table in WAL mode, keyed by task id (rows of plain
+# string items of old files get one from SQLite), with indexes on the sort
+# keys of the GUI (lowercased text, priority, due date) and on the
+# completed flag.
+# Besides the full reads and writes of every backend, the store changes
+# single rows inside a batched transaction that the owner commits, and
+# reads the rows of one sort order a page at a time, so the GUI never
+# holds the whole list in memory.
+
+PAGE_SIZE = 256
+CACHED_PAGES = 16
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL,
+    text_key TEXT NOT NULL,
+    due_date TEXT,
+    due_key INTEGER NOT NULL,
+    priority TEXT,
+    priority_key INTEGER NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    plain INTEGER NOT NULL DEFAULT 0,
+    extras TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_text ON tasks (text_key);
+CREATE INDEX IF NOT EXISTS tasks_priority ON tasks (priority_key);
+CREATE INDEX IF NOT EXISTS tasks_due_date ON tasks (due_key);
+CREATE INDEX IF NOT EXISTS tasks_completed ON tasks (completed);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta VALUES ('generation', 0);
+"""
+
+# Same order as the in-memory sort indexes, ties are broken by id
+SORT_COLUMNS = {"name": "text_key", "priority": "priority_key", "date": "due_key"}
+
+# PRAGMA synchronous for each durability level, in WAL mode NORMAL only
+# syncs at checkpoints
+SYNCHRONOUS = {"fsync": "FULL", "group": "NORMAL", "none": "OFF"}
+
+ITEM_COLUMNS = "id, text, due_date, priority, completed, plain, extras"
+# A task added twice, by a journal record applied again, replaces itself
+INSERT_SQL = (
+    "INSERT OR REPLACE INTO tasks (id, text, text_key, due_date, due_key, priority, priority_key,"
+    " completed, plain, extras) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+UPDATE_SQL = (
+    "UPDATE tasks SET text = ?, text_key = ?, due_date = ?, due_key = ?, priority = ?,"
+    " priority_key = ?, completed = ?, plain = ?, extras = ? WHERE id = ?"
+)
+
+
+def encode_item(item):
+    """Column values of a saved item, old console files store plain strings
+
+    The id is None for items without one, SQLite then picks it.
+    """
+    default_key = -PRIORITY_ORDER[DEFAULT_PRIORITY]
+    if isinstance(item, str):
+        return (None, item, item.lower(), None, NO_DUE_DATE, None, default_key, 0, 1, None)
+
+    extras = dict(item)
+    task_id = extras.pop("id", None)
+    text = extras.pop("text")
+    due_date = extras.pop("due_date", None)
+    priority = extras.pop("priority", None)
+    completed = extras.pop("completed", False)
+    if completed is not True and completed is not False:
+        extras["completed"] = completed
+        completed = False
+
+    ordinal = parse_due_date(due_date)[0]
+    return (
+        task_id, text, text.lower(), due_date, NO_DUE_DATE if ordinal is None else ordinal,
+        priority, -PRIORITY_ORDER.get(priority, 1), completed, 0,
+        json.dumps(extras, ensure_ascii=False) if extras else None
+    )
+
+
+def decode_item(row):
+    """Saved item of the ITEM_COLUMNS of a row"""
+    task_id, text, due_date, priority, completed, plain, extras = row
+    if plain:
+        # A plain string item, its row id is its task id now
+        return {"id": task_id, "text": text}
+
+    item = {"id": task_id, "text": text, "due_date": due_date}
+    if priority is not None:
+        item["priority"] = priority
+    item["completed"] = bool(completed)
+    if extras:
+        item.update(json.loads(extras))
+    return item
+
+
+def row_task(row):
+    """Task of an (id, text, due_date, priority, completed) row"""
+    task_id, text, due_date, priority, completed = row[:5]
+    return Task(text, due_date, priority or DEFAULT_PRIORITY, bool(completed), task_id=task_id)
+
+
+class SqliteBackend(StorageBackend):
+    """Tasks in an SQLite database, changed and read a row at a time
+
+    insert, update, delete and apply_operation only open a transaction,
+    commit() ends it, so a burst of changes costs one commit. Reads on the
+    same connection already see the uncommitted changes.
+    """
+
+    extension = ".db"
+    paged = True
+
+    def __init__(self, file_name, sync_policy=None):
+        super().__init__(file_name, sync_policy)
+        self._connection = None
+        self._count = None
+        self._pages = OrderedDict()  # (sort, page) -> (tasks, last key)
+        self._changed = False
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            # The console reads the tasks on a thread and changes them on
+            # the main one, never both at once
+            connection = sqlite3.connect(self.file_name, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            level = self.sync_policy.level if self.sync_policy else "fsync"
+            connection.execute(f"PRAGMA synchronous={SYNCHRONOUS[level]}")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def close(self):
+        """Commit pending changes and close the database"""
+        if self._connection is not None:
+            self.commit()
+            self._connection.close()
+            self._connection = None
+
+    # Transactions
+
+    def begin(self):
+        if not self.connection.in_transaction:
+            self.connection.execute("BEGIN")
+
+    def commit(self):
+        """Commit the changes made since the last commit"""
+        if self._connection is None or not self._connection.in_transaction:
+            return
+        if self._changed:
+            # Tells journals written against older contents apart
+            self._connection.execute("UPDATE meta SET value = value + 1 WHERE name = 'generation'")
+            self._changed = False
+        self._connection.execute("COMMIT")
+
+    def rollback(self):
+        if self._connection is not None and self._connection.in_transaction:
+            self._connection.execute("ROLLBACK")
+        self._changed = False
+        self.invalidate()
+
+    def token(self):
+        """Identifies the committed contents, like the token of a snapshot"""
+        count = self.count()
+        generation = self.connection.execute(
+            "SELECT value FROM meta WHERE name = 'generation'"
+        ).fetchone()[0]
+        return {"size": count, "crc": generation}
+
+    # Full reads and writes, shared with the other backends
+
+    def reader(self):
+        return SqliteReader(self)
+
+    def prepare(self, items):
+        # Rows can only be replaced in the transaction, commit() does it all
+        return PendingRows(self, items)
+
+    def write(self, items):
+        """Replace every row in one transaction"""
+        self.begin()
+        try:
+            self.connection.execute("DELETE FROM tasks")
+            self.connection.executemany(INSERT_SQL, map(encode_item, items))
+            self._changed = True
+            self.commit()
+        except Exception:
+            self.rollback()
+            raise
+        self.invalidate()
+        return self.token()
+
+    # Single row changes
+
+    def _changing(self):
+        self.begin()
+        self._changed = True
+        self._pages.clear()
+
+    def insert(self, task):
+        """Insert a task as the row with its id"""
+        self._changing()
+        self.connection.execute(INSERT_SQL, encode_item(task.to_dict()))
+        if self._count is not None:
+            self._count += 1
+
+    def update(self, task):
+        self._changing()
+        self.connection.execute(UPDATE_SQL, encode_item(task.to_dict())[1:] + (task.id,))
+
+    def delete(self, task_id):
+        self._changing()
+        self.connection.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+        if self._count is not None:
+            self._count -= 1
+
+    def apply_operation(self, op):
+        """Apply a journal record (add, set or del) to the rows"""
+        kind = op["op"]
+        self._changing()
+        if kind == "add":
+            self.connection.execute(INSERT_SQL, encode_item(op["item"]))
+            self.invalidate()
+            return
+
+        if "id" in op:
+            # A task that is gone is left alone, like in storage.apply_operation
+            row = (op["id"],)
+        else:
+            # Positions of older journals count rows in id order, like the
+            # list they came from
+            row = self.connection.execute(
+                "SELECT id FROM tasks ORDER BY id LIMIT 1 OFFSET ?", (op["index"],)
+            ).fetchone()
+            if row is None:
+                raise IndexError("task index out of range")
+        if kind == "set":
+            self.connection.execute(UPDATE_SQL, encode_item(op["item"])[1:] + row)
+        elif kind == "del":
+            self.connection.execute("DELETE FROM tasks WHERE id = ?", row)
+        else:
+            raise ValueError(f"Unknown journal operation: {kind}")
+        self.invalidate()
+
+    # Paged reads
+
+    def invalidate(self):
+        """Forget cached pages and the row count"""
+        self._count = None
+        self._pages.clear()
+
+    def count(self):
+        if self._count is None:
+            self._count = self.connection.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+        return self._count
+
+    def get(self, task_id):
+        row = self.connection.execute(
+            "SELECT id, text, due_date, priority, completed FROM tasks WHERE id = ?", (task_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(task_id)
+        return row_task(row)
+
+    def task_at(self, sort_by, row):
+        """Task in a row of a sort order, read with the rest of its page"""
+        page, offset = divmod(row, PAGE_SIZE)
+        tasks = self.page(sort_by, page)[0]
+        return tasks[offset]
+
+    def page(self, sort_by, page):
+        """(tasks, last sort key) of a page of rows"""
+        cached = self._pages.get((sort_by, page))
+        if cached is not None:
+            self._pages.move_to_end((sort_by, page))
+            return cached
+
+        column = SORT_COLUMNS[sort_by]
+        query = f"SELECT id, text, due_date, priority, completed, {column} AS sort_key FROM tasks"
+        previous = self._pages.get((sort_by, page - 1))
+        if previous is not None and previous[1] is not None:
+            # Scrolling down: seek past the previous page instead of
+            # counting rows from the start with OFFSET. The rest of the
+            # last key's rows and the rows of greater keys are two index
+            # seeks, a row value comparison would scan the equal keys
+            key, task_id = previous[1]
+            rows = self.connection.execute(
+                f"SELECT * FROM ({query} WHERE {column} = ? AND id > ? ORDER BY id LIMIT ?)"
+                f" UNION ALL SELECT * FROM ({query} WHERE {column} > ? ORDER BY {column}, id LIMIT ?)"
+                f" ORDER BY sort_key, id LIMIT ?",
+                (key, task_id, PAGE_SIZE, key, PAGE_SIZE, PAGE_SIZE)
+            ).fetchall()
+        else:
+            rows = self.connection.execute(
+                f"{query} ORDER BY {column}, id LIMIT ? OFFSET ?",
+                (PAGE_SIZE, page * PAGE_SIZE)
+            ).fetchall()
+
+        last_key = (rows[-1][5], rows[-1][0]) if rows else None
+        cached = ([row_task(row) for row in rows], last_key)
+        self._pages[(sort_by, page)] = cached
+        if len(self._pages) > CACHED_PAGES:
+            self._pages.popitem(last=False)
+        return cached
+
+    def row_of(self, sort_by, task):
+        """Row of a stored task in a sort order"""
+        column = SORT_COLUMNS[sort_by]
+        key = self.connection.execute(
+            f"SELECT {column} FROM tasks WHERE id = ?", (task.id,)
+        ).fetchone()
+        if key is None:
+            raise KeyError(task.id)
+        return self.connection.execute(
+            f"SELECT (SELECT COUNT(*) FROM tasks WHERE {column} < ?)"
+            f" + (SELECT COUNT(*) FROM tasks WHERE {column} = ? AND id < ?)",
+            (key[0], key[0], task.id)
+        ).fetchone()[0]
+
+
+class PendingRows:
+    """Items that replace the rows of a database on commit(), see PreparedWrite"""
+
+    def __init__(self, backend, items):
+        self.backend = backend
+        self.items = items
+
+    def commit(self):
+        return self.backend.write(self.items)
+
+    def discard(self):
+        self.items = None
+
+
+class SqliteReader:
+    """Iterate the rows of a task database as saved items, in id order"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.token = None
+
+    def __iter__(self):
+        cursor = self.backend.connection.execute(f"SELECT {ITEM_COLUMNS} FROM tasks ORDER BY id")
+        for row in cursor:
+            yield decode_item(row)
+        self.token = self.backend.token()
+
+
+def upgrade_item(item):
+    """Full task dict of an item, plain string tasks get the default fields"""
+    return Task.from_item(item).to_dict() if isinstance(item, str) else item
+
+
+def migrate(source, target):
+    """Copy a task file of any format into a database"""
+    return convert_file(source, target, convert=upgrade_item)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python sqlite_store.py SOURCE TARGET.db")
+        sys.exit(2)
+    count = migrate(sys.argv[1], sys.argv[2])
+    print(f"{count} tasks written to {sys.argv[2]}")
@@ -0,0 +1,642 @@
+import os
+import re
+import json
+import time
+import zlib
+import codecs
+import atexit
+import itertools
+import threading
+
+from task_model import assign_ids
+
+# Storage helpers shared by the console and GUI versions.
+#
+# The task file (tasks.json) is a full snapshot of the task list. In journal
+# mode every change is appended as a one-line JSON record to a journal file
+# next to the snapshot, so a single change costs O(1) I/O. The journal is
+# folded back into the snapshot (compacted) once it grows past a threshold.
+#
+# Snapshots are written to a temporary file which is renamed over the
+# original, so an interrupted save never leaves a truncated tasks.json.
+#
+# Every task has an id. Loaded tasks are kept in a dict from id to task, in
+# file order, and journal records name the task they change by id:
+#   {"op": "add", "id": 7, "item": {...}}
+#   {"op": "set", "id": 7, "item": {...}}
+#   {"op": "del", "id": 7}
+# Applying a record twice changes nothing more, and records of different
+# programs can be applied in any order as long as each task's own records
+# stay in order. Journals of older versions address tasks by list
+# position instead, they are replayed on the list they were written for.
+
+JOURNAL_SUFFIX = ".journal"
+COMPACT_THRESHOLD = 1000
+
+# "snapshot" rewrites the whole file on every change (the original behaviour),
+# "journal" appends change records and compacts periodically
+STORAGE_MODE = os.environ.get("TODO_STORAGE_MODE", "snapshot")
+
+
+# Durability levels:
+#   "fsync" - force every write to disk before returning
+#   "group" - group commit, force writes to disk at most once per interval
+#   "none"  - leave flushing to the operating system
+DURABILITY_LEVELS = ("fsync", "group", "none")
+DURABILITY = os.environ.get("TODO_DURABILITY", "fsync")
+GROUP_COMMIT_MS = int(os.environ.get("TODO_GROUP_COMMIT_MS", "50"))
+
+# Bytes read at a time when streaming a snapshot
+READ_CHUNK_SIZE = 1 << 16
+
+# Minimum time between two background snapshot saves of the GUI
+SAVE_INTERVAL_MS = int(os.environ.get("TODO_SAVE_INTERVAL_MS", "500"))
+
+
+def journal_enabled():
+    return STORAGE_MODE == "journal"
+
+
+def fsync_path(path):
+    """Force a file or directory that is not open to disk"""
+    if os.path.isdir(path):
+        # Directories cannot be opened for fsync on Windows
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    else:
+        # Windows needs write access to flush a file handle
+        fd = os.open(path, os.O_RDWR if os.name == "nt" else os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class SyncPolicy:
+    """Decide when written files are forced to disk"""
+
+    def __init__(self, level=None, interval_ms=None):
+        self.level = level or DURABILITY
+        if self.level not in DURABILITY_LEVELS:
+            raise ValueError(f"Unknown durability level: {self.level}")
+        if interval_ms is None:
+            interval_ms = GROUP_COMMIT_MS
+        self.interval = interval_ms / 1000
+        self._last_sync = 0.0
+        self._pending = set()
+        self._timer = None
+        self._lock = threading.Lock()
+        if self.level == "group":
+            atexit.register(self.flush)
+
+    def sync(self, file, path=None, directory=False):
+        """Apply the policy to a file that was just written
+
+        path is where the data will live once the caller is done (the
+        target of a rename), directory also syncs the containing directory.
+        """
+        if self.level == "none":
+            return
+
+        path = os.path.abspath(path or file.name)
+        if self.level == "fsync":
+            os.fsync(file.fileno())
+            if directory:
+                fsync_path(os.path.dirname(path))
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_sync >= self.interval and not self._pending:
+                self._last_sync = now
+                os.fsync(file.fileno())
+                if directory:
+                    self._pending.add(os.path.dirname(path))
+            else:
+                self._pending.add(path)
+                if directory:
+                    self._pending.add(os.path.dirname(path))
+            if self._pending and self._timer is None:
+                delay = max(0.0, self.interval - (now - self._last_sync))
+                self._timer = threading.Timer(delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Force all pending group commit writes to disk"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            paths, self._pending = self._pending, set()
+            self._last_sync = time.monotonic()
+        for path in paths:
+            if os.path.exists(path):
+                fsync_path(path)
+
+
+def snapshot_token(data):
+    """Identify a snapshot by its size and checksum"""
+    return {"size": len(data), "crc": zlib.crc32(data)}
+
+
+def file_token(file_name, chunk_size=READ_CHUNK_SIZE):
+    """Snapshot token of a file, computed from its bytes without parsing it"""
+    size = 0
+    crc = 0
+    if os.path.exists(file_name):
+        with open(file_name, 'rb') as file:
+            for chunk in iter(lambda: file.read(chunk_size), b""):
+                size += len(chunk)
+                crc = zlib.crc32(chunk, crc)
+    return {"size": size, "crc": crc}
+
+
+def file_stamp(file_name):
+    """[size, mtime, inode] of a task file and of its journal, None if missing
+
+    Any save changes the stamp: snapshots are replaced by a new file and
+    journals grow.
+    """
+    stamp = []
+    for path in (file_name, file_name + JOURNAL_SUFFIX):
+        try:
+            stat = os.stat(path)
+            stamp.append([stat.st_size, stat.st_mtime_ns, stat.st_ino])
+        except FileNotFoundError:
+            stamp.append(None)
+    return stamp
+
+
+def dump_snapshot(items):
+    return json.dumps(items, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def read_snapshot(file_name):
+    """Read the whole snapshot file and return (items, snapshot token)"""
+    if not os.path.exists(file_name):
+        return [], snapshot_token(b"")
+    with open(file_name, 'rb') as file:
+        data = file.read()
+    return json.loads(data), snapshot_token(data)
+
+
+class SnapshotReader:
+    """Parse a snapshot file one item at a time
+
+    The file is read in chunks and array elements are decoded one by one
+    with raw_decode, so memory holds one chunk of text instead of the whole
+    file. A file that does not start with '[' is read as line-delimited
+    JSON, one item per line. Once iteration is complete, token identifies
+    the snapshot for the journal.
+    """
+
+    _whitespace = re.compile(r"\s*")
+
+    def __init__(self, file_name, chunk_size=READ_CHUNK_SIZE):
+        self.file_name = file_name
+        self.chunk_size = chunk_size
+        self.token = snapshot_token(b"")
+        self._decoder = json.JSONDecoder()
+
+    def __iter__(self):
+        if not os.path.exists(self.file_name):
+            return
+        with open(self.file_name, 'rb') as file:
+            yield from self.parse(file)
+
+    def parse(self, file):
+        """Yield the items of a snapshot opened in binary mode"""
+        size = 0
+        crc = 0
+        text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        buffer = ""
+        pos = 0
+        eof = False
+
+        def fill():
+            nonlocal size, crc, buffer, pos, eof
+            chunk = file.read(self.chunk_size)
+            size += len(chunk)
+            crc = zlib.crc32(chunk, crc)
+            eof = not chunk
+            buffer = buffer[pos:] + text_decoder.decode(chunk, final=eof)
+            pos = 0
+
+        def skip_whitespace():
+            nonlocal pos
+            while True:
+                pos = self._whitespace.match(buffer, pos).end()
+                if pos < len(buffer) or eof:
+                    return
+                fill()
+
+        fill()
+        skip_whitespace()
+        if buffer[pos:pos + 1] == "[":
+            pos += 1
+            expect_item = True
+            while True:
+                skip_whitespace()
+                if pos == len(buffer):
+                    raise ValueError("Unexpected end of task file")
+                if buffer[pos] == "]":
+                    break
+                if not expect_item:
+                    if buffer[pos] != ",":
+                        raise ValueError(f"Expected ',' in task file at character {pos}")
+                    pos += 1
+                    skip_whitespace()
+
+                # An item at the end of the buffer may continue in the next chunk
+                try:
+                    item, end = self._decoder.raw_decode(buffer, pos)
+                except ValueError:
+                    end = len(buffer)
+                while end == len(buffer) and not eof:
+                    fill()
+                    try:
+                        item, end = self._decoder.raw_decode(buffer, pos)
+                    except ValueError:
+                        end = len(buffer)
+                if end == len(buffer):
+                    item, end = self._decoder.raw_decode(buffer, pos)
+                pos = end
+                expect_item = False
+                yield item
+        else:
+            # Line-delimited JSON
+            while True:
+                newline = buffer.find("\n", pos)
+                while newline < 0 and not eof:
+                    fill()
+                    newline = buffer.find("\n", pos)
+                line = buffer[pos:] if newline < 0 else buffer[pos:newline]
+                pos = len(buffer) if newline < 0 else newline + 1
+                if line.strip():
+                    yield json.loads(line)
+                if newline < 0:
+                    break
+
+        # Read to the end so the token covers the whole file
+        while not eof:
+            fill()
+        self.token = {"size": size, "crc": crc}
+
+
+def atomic_write(file_name, data, sync_policy=None):
+    """Replace file_name with data without ever exposing a partial file"""
+    PreparedWrite(file_name, data, sync_policy).commit()
+
+
+class PreparedWrite:
+    """Data written next to a file, which commit() then replaces at once
+
+    Writing and syncing the data is the slow part and happens on creation,
+    commit() only renames, so a caller holding a lock can prepare before
+    taking it. discard() removes the data again if it is not committed.
+    """
+
+    def __init__(self, file_name, data, sync_policy=None):
+        # Imported on first use, it pulls in several modules that commands
+        # which only append never need
+        import tempfile
+
+        self.file_name = file_name
+        self.token = snapshot_token(data)
+        directory = os.path.dirname(os.path.abspath(file_name))
+        fd, self.temp_name = tempfile.mkstemp(
+            prefix=os.path.basename(file_name) + ".", suffix=".tmp", dir=directory
+        )
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+                file.flush()
+                if sync_policy is not None:
+                    sync_policy.sync(file, path=file_name, directory=True)
+        except BaseException:
+            self.discard()
+            raise
+
+    def commit(self):
+        """Replace the file with the data, return its snapshot token"""
+        try:
+            if os.path.exists(self.file_name):
+                os.chmod(self.temp_name, os.stat(self.file_name).st_mode & 0o777)
+            else:
+                os.chmod(self.temp_name, 0o644)
+            os.replace(self.temp_name, self.file_name)
+        except BaseException:
+            self.discard()
+            raise
+        self.temp_name = None
+        return self.token
+
+    def discard(self):
+        if self.temp_name is not None and os.path.exists(self.temp_name):
+            os.remove(self.temp_name)
+        self.temp_name = None
+
+
+def write_snapshot(file_name, items, sync_policy=None):
+    """Write the full item list and return its snapshot token"""
+    data = dump_snapshot(items)
+    atomic_write(file_name, data, sync_policy)
+    return snapshot_token(data)
+
+
+def keyed_items(items):
+    """{id: item} of saved items in file order, None if one has no id"""
+    by_id = {}
+    for item in items:
+        if type(item) is not dict or "id" not in item:
+            # Saved by a version without task ids
+            return None
+        by_id[item["id"]] = item
+    return by_id
+
+
+def keyed_operation(items, op):
+    """op with the id of the task it changes
+
+    Records of journals written before tasks had ids address a position
+    in items (a dict from id to item, in file order) instead, and add
+    items without an id, which get a new one. A position past the end
+    gives the id None, the record then changes nothing.
+    """
+    if "id" in op:
+        return op
+    item = op.get("item")
+    if op["op"] == "add":
+        if type(item) is not dict or "id" not in item:
+            item = assign_ids([item])[0]
+        return {"op": "add", "id": item["id"], "item": item}
+    task_id = next(itertools.islice(items, op["index"], None), None)
+    op = {"op": op["op"], "id": task_id}
+    if item is not None:
+        # The item keeps the id of the task it replaces
+        op["item"] = {**assign_ids([item])[0], "id": task_id}
+    return op
+
+
+def apply_operation(items, op, convert=None):
+    """Apply a single journal record to items, a dict from id to item
+
+    A set or del of a task that is gone changes nothing. Positional records
+    of older journals also apply to a list. convert turns the journaled
+    item into the type kept in items.
+    """
+    kind = op["op"]
+    if kind not in ("add", "set", "del"):
+        raise ValueError(f"Unknown journal operation: {kind}")
+
+    if isinstance(items, list):
+        if kind == "add":
+            items.append(convert(op["item"]) if convert else op["item"])
+        elif kind == "set":
+            items[op["index"]] = convert(op["item"]) if convert else op["item"]
+        else:
+            del items[op["index"]]
+        return
+
+    op = keyed_operation(items, op)
+    task_id = op["id"]
+    if kind == "del":
+        items.pop(task_id, None)
+    elif kind == "add" or task_id in items:
+        items[task_id] = convert(op["item"]) if convert else op["item"]
+
+
+class TaskJournal:
+    """Append-only log of task changes kept next to the snapshot file"""
+
+    def __init__(self, file_name, compact_threshold=COMPACT_THRESHOLD, sync_policy=None):
+        self.file_name = file_name
+        self.path = file_name + JOURNAL_SUFFIX
+        self.compact_threshold = compact_threshold
+        self.sync_policy = sync_policy or SyncPolicy()
+        self.count = 0
+        self.base = snapshot_token(b"")
+        self._file = None
+        self._valid_size = None  # Usable bytes of an existing journal
+
+    def replay_items(self, items, token):
+        """List of the snapshot items with the journal applied, in file order"""
+        by_id = keyed_items(items)
+        if by_id is None:
+            return self.replay(items, token)
+        return list(self.replay(by_id, token).values())
+
+    def replay(self, items, token, convert=None):
+        """Apply journaled changes on top of the snapshot items
+
+        With items set to None the journal is only checked, so that new
+        records can be appended without reading the snapshot.
+        """
+        for op in self.records(token):
+            if items is not None:
+                apply_operation(items, op, convert)
+        return items
+
+    def records(self, token):
+        """Records of the journal written for the snapshot with token, in order"""
+        self.close()
+        self.count = 0
+        self.base = token
+        self._valid_size = None
+        if not os.path.exists(self.path):
+            return []
+
+        ops = []
+        with open(self.path, 'rb') as file:
+            header = file.readline()
+            try:
+                base = json.loads(header)
+            except ValueError:
+                return []
+
+            # A journal written against another snapshot has already been
+            # compacted into it (or belongs to a different file)
+            if base.get("size") != self.base["size"] or base.get("crc") != self.base["crc"]:
+                return []
+
+            offset = len(header)
+            for op, size in self._records(file):
+                ops.append(op)
+                offset += size
+                self.count += 1
+
+        self._valid_size = offset
+        return ops
+
+    def follow(self):
+        """Records another process appended since the last replay or write
+
+        Returns None when the journal was started against a snapshot other
+        than the one last replayed, then only a full read is correct.
+        """
+        self.close()
+        try:
+            file = open(self.path, 'rb')
+        except FileNotFoundError:
+            return [] if self._valid_size is None else None
+
+        ops = []
+        with file:
+            offset = self._valid_size
+            if offset is None:
+                # Started since, by a process that read the same snapshot
+                header = file.readline()
+                try:
+                    base = json.loads(header)
+                except ValueError:
+                    return None
+                if base.get("size") != self.base["size"] or base.get("crc") != self.base["crc"]:
+                    return None
+                offset = len(header)
+            else:
+                file.seek(offset)
+            for op, size in self._records(file):
+                ops.append(op)
+                offset += size
+
+        self._valid_size = offset
+        self.count += len(ops)
+        return ops
+
+    def _records(self, file):
+        """(record, size in bytes) of each complete record from the file position"""
+        for line in file:
+            # Stop at a torn record left by an interrupted write, or one
+            # that another process is still writing
+            if not line.endswith(b"\n"):
+                break
+            try:
+                op = json.loads(line)
+            except ValueError:
+                break
+            yield op, len(line)
+
+    def _open(self):
+        if self._file is not None:
+            return self._file
+
+        if self._valid_size is None:
+            self._file = open(self.path, 'wb')
+            header = dict(op="base", **self.base)
+            self._file.write(json.dumps(header).encode("utf-8") + b"\n")
+            self._file.flush()
+            self.sync_policy.sync(self._file, directory=True)
+        else:
+            self._file = open(self.path, 'r+b')
+            self._file.truncate(self._valid_size)
+            self._file.seek(self._valid_size)
+        return self._file
+
+    def append(self, op):
+        """Append one change record, return True when compaction is due"""
+        file = self._open()
+        file.write(json.dumps(op, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+        file.flush()
+        self.sync_policy.sync(file)
+        self._valid_size = file.tell()
+        self.count += 1
+        return self.count >= self.compact_threshold
+
+    def extend(self, ops):
+        """Append many records with a single sync, return True when compaction is due"""
+        file = self._open()
+        file.write(b"".join(
+            json.dumps(op, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+            for op in ops
+        ))
+        file.flush()
+        self.sync_policy.sync(file)
+        self._valid_size = file.tell()
+        self.count += len(ops)
+        return self.count >= self.compact_threshold
+
+    def reset(self, token):
+        """Drop the journal after its changes were written into a new snapshot"""
+        self.close()
+        self.count = 0
+        self.base = token
+        self._valid_size = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class BackgroundWriter:
+    """Run writes on a worker thread, keeping only the latest pending payload"""
+
+    def __init__(self, write):
+        self.write = write
+        self.writes = 0
+        self.error = None
+        self._pending = None
+        self._has_pending = False
+        self._busy = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, payload):
+        """Queue payload for writing, replacing any payload not written yet"""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Writer is closed")
+            self._pending = payload
+            self._has_pending = True
+            self._condition.notify_all()
+
+    def flush(self):
+        """Block until every submitted payload has been written"""
+        with self._condition:
+            while self._has_pending or self._busy:
+                self._condition.wait()
+
+    def idle(self):
+        """True when nothing is waiting to be written or being written"""
+        with self._condition:
+            return not (self._has_pending or self._busy)
+
+    def pop_error(self):
+        """Return and clear the error raised by the last failed write"""
+        error, self.error = self.error, None
+        return error
+
+    def close(self):
+        self.flush()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._has_pending and not self._closed:
+                    self._condition.wait()
+                if not self._has_pending:
+                    return
+                payload = self._pending
+                self._pending = None
+                self._has_pending = False
+                self._busy = True
+
+            try:
+                self.write(payload)
+                self.writes += 1
+            except Exception as e:
+                self.error = e
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
@@ -0,0 +1,254 @@
+import itertools
+
+from backends import TASK_FILE, open_backend
+from concurrency import ConflictError, SharedTaskFile, item_key
+from storage import SyncPolicy, TaskJournal, apply_operation, file_stamp, file_token, journal_enabled, keyed_operation
+from task_model import Task
+
+# The task list of one task file, shared by the console, the GUI and the
+# command line.
+#
+# The engine keeps the tasks as Task objects by id, in file order, and is
+# the only place that reads them from the backend, applies the journal,
+# turns changes into journal records or row changes, and saves. Front-ends
+# change tasks through add(), update() and delete(), which return the
+# journal record of the change, and then persist the records: the console
+# and the command line at once with persist(), the GUI on its background
+# writer with a copy of the tasks and write().
+
+
+class TaskEngine:
+    """Tasks of a task file, read, changed and saved alongside other programs"""
+
+    def __init__(self, file_name=None, sync_policy=None):
+        self.file_name = file_name or TASK_FILE
+        self.sync_policy = sync_policy or SyncPolicy()
+        self.backend = open_backend(self.file_name, self.sync_policy)
+        self.journal = TaskJournal(self.file_name, sync_policy=self.sync_policy)
+        # Other programs may save the same file, see concurrency.py
+        self.shared = SharedTaskFile(self.backend, self.journal)
+        self.use_journal = journal_enabled()
+        self.tasks = {}  # Task by id, in file order
+        self._reader = None
+        self._items = None
+        self._migrating = False
+
+    @property
+    def paged(self):
+        """True when the backend reads and changes single tasks in place"""
+        return self.backend.paged
+
+    def items(self):
+        """{id: saved item} of every task"""
+        return {task_id: task.to_dict() for task_id, task in self.tasks.items()}
+
+    # Reading
+
+    def start_reading(self):
+        """Forget the tasks and start reading them from the file"""
+        self.tasks = {}
+        # The items are remembered as read, to merge later saves of others
+        self.shared.loaded({}, file_stamp(self.file_name))
+        self._reader = self.backend.reader()
+        self._items = iter(self._reader)
+        self._migrating = False
+
+    def read_batch(self, size=None):
+        """Read up to size more tasks (all with None) and return them"""
+        items = list(itertools.islice(self._items, size))
+        batch = [Task.from_item(item) for item in items]
+        self.tasks.update((task.id, task) for task in batch)
+        self.shared.base_keys.update((task.id, item_key(item)) for task, item in zip(batch, items))
+        if not self._migrating:
+            # Files saved before tasks had ids get new ones once read
+            self._migrating = any(type(item) is not dict or "id" not in item for item in items)
+        return batch
+
+    def finish_reading(self, migrate=True):
+        """Apply the journal to the tasks read, return the (removed, added) tasks
+
+        A file saved before tasks had ids is saved with their new ids at
+        once, unless migrate is False: commands that only read leave it as
+        it is. Raises ConflictError when another program saved the file
+        while it was read, it must then be read again.
+        """
+        if self.shared.changed():
+            raise ConflictError(self.file_name)
+        token = self._reader.token
+        self._items = None
+        if self._migrating:
+            # The journal of such a file addresses tasks by list position
+            old_tasks = list(self.tasks.values())
+            tasks = self.journal.replay(list(old_tasks), token, convert=Task.from_item)
+            changes = (old_tasks, tasks) if self.journal.count else ([], [])
+            self.tasks = {task.id: task for task in tasks}
+            if migrate:
+                # Saved at once, so that other programs see the same ids
+                self.shared.save(self.items(), merge=False)
+            return changes
+
+        ops = []
+        for op in self.journal.records(token):
+            # Positions count the tasks as the records before left them
+            op = keyed_operation(self.shared.base_keys, op)
+            apply_operation(self.shared.base_keys, op, item_key)
+            ops.append(op)
+        return self.apply_records(ops)
+
+    def load(self, migrate=True):
+        """Read every task, return {id: Task}, see finish_reading() for migrate"""
+        while True:
+            self.start_reading()
+            self.read_batch()
+            try:
+                self.finish_reading(migrate)
+                return self.tasks
+            except ConflictError:
+                # Saved by another program meanwhile, read it again
+                continue
+
+    # Changes of other programs
+
+    def changed(self):
+        """True when another program saved the file since it was last read"""
+        return not self.paged and self.shared.changed()
+
+    def follow(self):
+        """Take in what another program saved, return (removed, added) tasks
+
+        Appended journal records are applied one by one. A rewritten file
+        is read again and tasks equal to the ones shown are kept.
+        """
+        ops = self.shared.appended()
+        if ops is not None:
+            return self.apply_records(ops)
+
+        items, unchanged = self.shared.reload()
+        old_tasks = self.tasks
+        self.tasks = {
+            task_id: old_tasks[task_id] if task_id in unchanged else Task.from_item(item)
+            for task_id, item in items.items()
+        }
+        tasks = self.tasks
+        removed = [task for task_id, task in old_tasks.items() if tasks.get(task_id) is not task]
+        added = [task for task_id, task in tasks.items() if old_tasks.get(task_id) is not task]
+        return removed, added
+
+    def apply_records(self, ops):
+        """Apply journal records to the tasks, return the (removed, added) tasks"""
+        old_tasks = {}
+        for op in ops:
+            if op["id"] not in old_tasks:
+                old_tasks[op["id"]] = self.tasks.get(op["id"])
+            apply_operation(self.tasks, op, Task.from_item)
+
+        tasks = self.tasks
+        removed = [task for task_id, task in old_tasks.items() if task is not None and tasks.get(task_id) is not task]
+        added = [tasks[task_id] for task_id, task in old_tasks.items() if task_id in tasks and tasks[task_id] is not task]
+        return removed, added
+
+    # Changes
+
+    def add(self, task):
+        """Add a task, return its journal record"""
+        self.tasks[task.id] = task
+        return {"op": "add", "id": task.id, "item": task.to_dict()}
+
+    def update(self, task):
+        """Journal record of a task changed in place, or of a new Task with its id
+
+        A new Task replaces the old one, which a copy of the tasks being
+        written may still hold.
+        """
+        if task.id in self.tasks:
+            self.tasks[task.id] = task
+        return {"op": "set", "id": task.id, "item": task.to_dict()}
+
+    def delete(self, task):
+        """Remove a task, return its journal record"""
+        # A paged backend may hold tasks that were never read
+        self.tasks.pop(task.id, None)
+        return {"op": "del", "id": task.id}
+
+    def persist(self, records):
+        """Persist change records at once, return True if others' changes were merged"""
+        if self.paged:
+            # The database changes the rows in one transaction of its own
+            try:
+                self.change_rows(records)
+                self.backend.commit()
+            except Exception:
+                self.backend.rollback()
+                raise
+            return False
+        if not self.use_journal:
+            return self.save()
+        try:
+            changes, due = self.log_changes(records)
+            if due:
+                # Fold the journal back into the snapshot
+                return self.save()
+            return False
+        except ConflictError:
+            # Another program saved first, the records no longer fit its file
+            return self.save()
+
+    def log_changes(self, records):
+        """Append change records to the journal
+
+        Records other programs appended meanwhile are applied to the tasks
+        first. Returns their (removed, added) tasks, as follow() does, and
+        True when compaction is due. Raises ConflictError if another program
+        rewrote the file or changed the same tasks since the last read.
+        """
+        theirs, due = self.shared.append(records)
+        return self.apply_records(theirs), due
+
+    def change_rows(self, records):
+        """Apply change records to a paged backend, the next commit keeps them"""
+        for record in records:
+            self.backend.apply_operation(record)
+
+    def append(self, tasks):
+        """Add tasks without reading the task list"""
+        records = [{"op": "add", "id": task.id, "item": task.to_dict()} for task in tasks]
+        if self.paged:
+            self.persist(records)
+            return
+        # The journal only needs the checksum of the snapshot, which no
+        # other process may replace before the records are appended
+        with self.shared.lock:
+            self.journal.replay(None, file_token(self.file_name))
+            due = self.journal.extend(records)
+        if due:
+            self.load()
+            self.save()
+
+    def save(self):
+        """Write every task, return True if changes of others were merged in"""
+        merges = self.shared.merges
+        items = self.shared.save(self.items())
+        if self.shared.merges == merges:
+            return False
+        self.tasks = {task_id: Task.from_item(item) for task_id, item in items.items()}
+        return True
+
+    def write(self, tasks):
+        """Write a copy of the tasks made earlier, can run on another thread
+
+        The copy only holds the Task objects, the items are made here; tasks
+        must not be changed in place meanwhile. Raises ConflictError if
+        another program saved since the last read, merge() then takes in
+        its changes.
+        """
+        self.shared.save({task_id: task.to_dict() for task_id, task in tasks.items()}, merge=False)
+
+    def merge(self):
+        """Merge the tasks with the file another program saved"""
+        items = self.shared.merge(self.items())
+        self.tasks = {task_id: Task.from_item(item) for task_id, item in items.items()}
+
+    def close(self):
+        self.journal.close()
+        self.sync_policy.flush()
+        self.backend.close()
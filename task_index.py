@@ -0,0 +1,415 @@
+import bisect
+import functools
+from datetime import date
+
+from task_model import PRIORITY_ORDER
+
+# Sorted indexes over tasks, one per sort order of the GUI.
+#
+# Every index key ends with the task id, which makes keys unique and keeps
+# tasks with equal values in creation order, like a stable sort would.
+# Indexes are updated on add/edit/delete instead of re-sorting, and can
+# answer range queries such as "due before a date" with two bisects.
+
+# Sorts after every real due date
+NO_DUE_DATE = date.max.toordinal() + 1
+
+# Due date ranges, as the first and the end (excluded) date ordinal of the
+# due dates they hold. Due within N days counts today as the first day.
+def overdue_range(today):
+    return 0, today
+
+
+def due_within_range(days, today):
+    return today, today + days
+
+
+# Due date filters of the GUI, by the ordinal of today
+DUE_FILTERS = {
+    "overdue": overdue_range,
+    "week": functools.partial(due_within_range, 7)
+}
+
+SORT_KEYS = {
+    "name": lambda task: (task.text.lower(), task.id),
+    "priority": lambda task: (-PRIORITY_ORDER.get(task.priority, 1), task.id),
+    # Tasks without a due date go to the end
+    "date": lambda task: (
+        NO_DUE_DATE if task.due_ordinal is None else task.due_ordinal, task.id
+    )
+}
+
+
+class SortedKeyList:
+    """Sorted list of unique keys with O(log N) insert, remove and row lookup
+
+    Keys are kept in sublists of at most 2 * load items. A Fenwick tree
+    over the sublist lengths maps list rows to sublists, so neither
+    updates nor positional lookups touch more than one sublist.
+    """
+
+    def __init__(self, keys=(), load=1000):
+        self.load = load
+        self._lists = []
+        self._maxes = []
+        self._tree = []
+        self._len = 0
+        self.reset(keys)
+
+    def reset(self, keys):
+        """Replace the contents with keys, which must be sorted"""
+        keys = list(keys)
+        self._lists = [keys[i:i + self.load] for i in range(0, len(keys), self.load)]
+        self._maxes = [sublist[-1] for sublist in self._lists]
+        self._len = len(keys)
+        self._build_tree()
+
+    def _build_tree(self):
+        tree = [0] + [len(sublist) for sublist in self._lists]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, index, delta):
+        i = index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _tree_prefix(self, index):
+        """Number of keys in the sublists before index"""
+        total = 0
+        i = index
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, row):
+        """Sublist index and offset of a row"""
+        if row < 0:
+            row += self._len
+        if not 0 <= row < self._len:
+            raise IndexError("row out of range")
+        index = 0
+        step = 1 << (len(self._tree).bit_length())
+        while step:
+            nxt = index + step
+            if nxt < len(self._tree) and self._tree[nxt] <= row:
+                index = nxt
+                row -= self._tree[nxt]
+            step >>= 1
+        return index, row
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, row):
+        index, offset = self._locate(row)
+        return self._lists[index][offset]
+
+    def __iter__(self):
+        for sublist in self._lists:
+            yield from sublist
+
+    def slice(self, start, stop):
+        """Keys in rows start to stop, without copying the whole list"""
+        start = max(0, start)
+        stop = min(self._len, stop)
+        if start >= stop:
+            return []
+        index, offset = self._locate(start)
+        result = []
+        while len(result) < stop - start:
+            sublist = self._lists[index]
+            result.extend(sublist[offset:offset + stop - start - len(result)])
+            index += 1
+            offset = 0
+        return result
+
+    def bisect_left(self, key):
+        """Row of the first key that is not less than key"""
+        index = bisect.bisect_left(self._maxes, key)
+        if index == len(self._maxes):
+            return self._len
+        return self._tree_prefix(index) + bisect.bisect_left(self._lists[index], key)
+
+    def add(self, key):
+        """Insert key and return its row"""
+        if not self._lists:
+            self.reset([key])
+            return 0
+
+        index = bisect.bisect_left(self._maxes, key)
+        if index == len(self._maxes):
+            index -= 1
+        sublist = self._lists[index]
+        offset = bisect.bisect_left(sublist, key)
+        sublist.insert(offset, key)
+        self._maxes[index] = sublist[-1]
+        self._len += 1
+        row = self._tree_prefix(index) + offset
+
+        if len(sublist) > 2 * self.load:
+            self._lists[index:index + 1] = [sublist[:self.load], sublist[self.load:]]
+            self._maxes[index:index + 1] = [self._lists[index][-1], self._lists[index + 1][-1]]
+            self._build_tree()
+        else:
+            self._tree_add(index, 1)
+        return row
+
+    def update(self, keys):
+        """Insert many keys at once
+
+        Each sublist takes the new keys up to its largest one, the last
+        sublist the rest, and only sublists that grew too long are split.
+        A batch costs about its own size, not the size of the list.
+        """
+        keys = sorted(keys)
+        if not keys:
+            return
+        if not self._lists:
+            self.reset(keys)
+            return
+
+        lists = self._lists
+        last = len(lists) - 1
+        start = 0
+        for index, largest in enumerate(self._maxes):
+            if start == len(keys):
+                break
+            stop = len(keys) if index == last else bisect.bisect_right(keys, largest, start)
+            if stop == start:
+                continue
+            sublist = lists[index]
+            if 8 * (stop - start) < len(sublist):
+                for key in keys[start:stop]:
+                    bisect.insort(sublist, key)
+            else:
+                # Two sorted runs, which sort() merges in linear time
+                sublist.extend(keys[start:stop])
+                sublist.sort()
+            start = stop
+
+        load = self.load
+        if any(len(sublist) > 2 * load for sublist in lists):
+            self._lists = [
+                part
+                for sublist in lists
+                for part in ([sublist] if len(sublist) <= 2 * load else
+                             [sublist[i:i + load] for i in range(0, len(sublist), load)])
+            ]
+        self._maxes = [sublist[-1] for sublist in self._lists]
+        self._len += len(keys)
+        self._build_tree()
+
+    def remove(self, key):
+        """Remove key and return the row it had"""
+        index = bisect.bisect_left(self._maxes, key)
+        sublist = self._lists[index] if index < len(self._lists) else []
+        offset = bisect.bisect_left(sublist, key)
+        if offset == len(sublist) or sublist[offset] != key:
+            raise KeyError(key)
+
+        row = self._tree_prefix(index) + offset
+        del sublist[offset]
+        self._len -= 1
+        if sublist:
+            self._maxes[index] = sublist[-1]
+            self._tree_add(index, -1)
+        else:
+            del self._lists[index]
+            del self._maxes[index]
+            self._build_tree()
+        return row
+
+
+class SortIndex:
+    """Task ids ordered by one sort key"""
+
+    def __init__(self, key):
+        self.key = key
+        self.keys = SortedKeyList()
+
+    def build(self, tasks):
+        self.keys.reset(sorted(map(self.key, tasks)))
+
+    def extend(self, tasks):
+        """Add many tasks at once, cheaper than add for large batches"""
+        self.keys.update(map(self.key, tasks))
+
+    def add(self, task):
+        return self.keys.add(self.key(task))
+
+    def remove(self, task):
+        """Remove a task, its fields must not have changed since it was added"""
+        return self.keys.remove(self.key(task))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def id_at(self, row):
+        return self.keys[row][-1]
+
+    def row_of(self, task):
+        """Row of a task, None if it is not in the index"""
+        key = self.key(task)
+        row = self.keys.bisect_left(key)
+        if row < len(self.keys) and self.keys[row] == key:
+            return row
+        return None
+
+    def ids(self, start=0, stop=None):
+        """Task ids in rows start to stop"""
+        if stop is None:
+            stop = len(self.keys)
+        return [key[-1] for key in self.keys.slice(start, stop)]
+
+    def rows_between(self, low, high=None):
+        """Rows whose key starts within [low, high), keys compare as tuples"""
+        start = self.keys.bisect_left(low)
+        stop = len(self.keys) if high is None else self.keys.bisect_left(high)
+        return start, max(start, stop)
+
+    def ids_between(self, low, high=None):
+        return self.ids(*self.rows_between(low, high))
+
+
+class TaskIndexes:
+    """The sort indexes of a task list, kept in step with its changes
+
+    Next to them, sets of the pending tasks and of the tasks of each
+    priority serve the filters of the GUI. filter() intersects them,
+    smallest first, and caches the result, which add() and remove() then
+    keep up to date instead of dropping it.
+    """
+
+    def __init__(self):
+        self.indexes = {name: SortIndex(key) for name, key in SORT_KEYS.items()}
+        self.pending = set()
+        self.by_priority = {}
+        self.filtered = {}  # Ids by filter, for filter_day
+        self.filter_day = None
+
+    def __getitem__(self, name):
+        return self.indexes[name]
+
+    def build(self, tasks):
+        for index in self.indexes.values():
+            index.build(tasks)
+        self.pending = set()
+        self.by_priority = {}
+        self.filtered = {}
+        self._add_to_sets(tasks)
+
+    def extend(self, tasks):
+        for index in self.indexes.values():
+            index.extend(tasks)
+        self.filtered = {}
+        self._add_to_sets(tasks)
+
+    def _add_to_sets(self, tasks):
+        by_priority = self.by_priority
+        for task in tasks:
+            if not task.completed:
+                self.pending.add(task.id)
+            ids = by_priority.get(task.priority)
+            if ids is None:
+                ids = by_priority[task.priority] = set()
+            ids.add(task.id)
+
+    def add(self, task):
+        """Add a task and return its row in every index"""
+        self._add_to_sets((task,))
+        for key, ids in self.filtered.items():
+            if self.passes(task, *key):
+                ids.add(task.id)
+        return {name: index.add(task) for name, index in self.indexes.items()}
+
+    def remove(self, task):
+        """Remove a task and return the row it had in every index"""
+        self.pending.discard(task.id)
+        self.by_priority[task.priority].discard(task.id)
+        for ids in self.filtered.values():
+            ids.discard(task.id)
+        return {name: index.remove(task) for name, index in self.indexes.items()}
+
+    def filter(self, hide_completed=False, priority=None, due=None, today=None):
+        """Ids of the tasks that pass the filters, None without a filter
+
+        due is a key of DUE_FILTERS, today a date ordinal (default the
+        current date). Like SearchIndex.search, the set returned belongs to
+        the indexes and must not be changed.
+        """
+        if not (hide_completed or priority or due):
+            return None
+        if today is None:
+            today = date.today().toordinal()
+        if today != self.filter_day:
+            # Due date filters move with the day
+            self.filtered = {}
+            self.filter_day = today
+
+        key = (hide_completed, priority, due)
+        ids = self.filtered.get(key)
+        if ids is None:
+            sets = []
+            if hide_completed:
+                sets.append(self.pending)
+            if priority:
+                sets.append(self.by_priority.get(priority, set()))
+            if due:
+                first, end = DUE_FILTERS[due](today)
+                sets.append(set(self["date"].ids_between((first,), (end,))))
+            # & only walks the smaller side, the copy the smallest set
+            sets.sort(key=len)
+            ids = self.filtered[key] = sets[0].intersection(*sets[1:])
+        return ids
+
+    def passes(self, task, hide_completed=False, priority=None, due=None):
+        """True when a task passes the filters, for the day of filter()"""
+        if hide_completed and task.completed:
+            return False
+        if priority and task.priority != priority:
+            return False
+        if due:
+            first, end = DUE_FILTERS[due](self.filter_day)
+            return task.due_ordinal is not None and first <= task.due_ordinal < end
+        return True
+
+    def due_before(self, day):
+        """Ids of tasks due before a YYYY-MM-DD date, earliest first"""
+        return self["date"].ids_between((), (date.fromisoformat(day).toordinal(),))
+
+    def due_between(self, start, end):
+        """Ids of tasks due from start up to and including end"""
+        low = date.fromisoformat(start).toordinal()
+        high = date.fromisoformat(end).toordinal()
+        return self["date"].ids_between((low,), (high + 1,))
+
+    def overdue(self, today=None):
+        """Ids of tasks due before today (a date ordinal, default the current
+        date), earliest first, completed or not"""
+        if today is None:
+            today = date.today().toordinal()
+        first, end = overdue_range(today)
+        return self["date"].ids_between((first,), (end,))
+
+    def due_within(self, days, today=None):
+        """Ids of tasks due within days days from today, today included"""
+        if today is None:
+            today = date.today().toordinal()
+        first, end = due_within_range(days, today)
+        return self["date"].ids_between((first,), (end,))
+
+    def with_priority(self, priority):
+        """Ids of tasks with a priority, in creation order"""
+        order = -PRIORITY_ORDER[priority]
+        return self["priority"].ids_between((order,), (order + 1,))
+
+    def name_prefix(self, prefix):
+        """Ids of tasks whose text starts with prefix, ignoring case"""
+        prefix = prefix.lower()
+        return self["name"].ids_between((prefix,), (prefix + "\U0010ffff",))
@@ -0,0 +1,237 @@
+import sys
+import time
+import random
+import functools
+import threading
+from array import array
+from datetime import date
+
+# Task model of the GUI version.
+#
+# Task uses __slots__ instead of a per-instance __dict__, shares one string
+# object per priority and keeps the due date as a date ordinal (days since
+# 0001-01-01). TaskStore keeps the same fields in typed arrays, one column
+# per field, for lists that are read far more often than they are edited.
+
+PRIORITIES = ("low", "medium", "high")
+PRIORITY_ORDER = {priority: code for code, priority in enumerate(PRIORITIES)}
+DEFAULT_PRIORITY = "medium"
+
+# Marks of a task row, unknown priorities show the default one
+COMPLETED_MARK = "✓ "
+PENDING_MARK = "□ "
+PRIORITY_MARKERS = {"low": "⬇️", "medium": "➡️", "high": "⬆️"}
+DEFAULT_MARKER = PRIORITY_MARKERS[DEFAULT_PRIORITY]
+
+# Task ids are saved with the tasks. The milliseconds since 1970 in the
+# high bits keep ids in creation order, random low bits keep the ids that
+# programs sharing a file create in the same millisecond apart
+ID_RANDOM_BITS = 20
+
+_last_id = 0
+_id_lock = threading.Lock()
+
+
+def new_task_id():
+    """A new task id, greater than every id this program made before"""
+    global _last_id
+    task_id = (time.time_ns() // 1000000) << ID_RANDOM_BITS | random.getrandbits(ID_RANDOM_BITS)
+    with _id_lock:
+        if task_id <= _last_id:
+            task_id = _last_id + 1
+        _last_id = task_id
+    return task_id
+
+
+# Due dates repeat a lot across tasks, both conversions are cached
+@functools.lru_cache(maxsize=4096)
+def parse_due_date(value):
+    """Split a due date into (ordinal, text)
+
+    Real YYYY-MM-DD dates are stored as an ordinal only. Anything else that
+    an older version may have saved is kept as text and sorts like a task
+    without a due date.
+    """
+    if not value:
+        return None, None
+    # fromisoformat also accepts other ISO forms such as 20250131
+    if len(value) != 10 or value[4] != "-" or value[7] != "-":
+        return None, value
+    try:
+        return date.fromisoformat(value).toordinal(), None
+    except (TypeError, ValueError):
+        return None, value
+
+
+@functools.lru_cache(maxsize=4096)
+def format_due_date(ordinal):
+    return date.fromordinal(ordinal).isoformat()
+
+
+class Task:
+    # _row caches the text of __str__ after the fields it was made from
+    __slots__ = ("id", "text", "priority", "due_ordinal", "_due_text", "completed", "_row")
+
+    def __init__(self, text, due_date=None, priority=DEFAULT_PRIORITY, completed=False, task_id=None):
+        self.id = task_id if task_id is not None else new_task_id()
+        self.text = text
+        self.due_date = due_date
+        # One shared string per priority value
+        self.priority = sys.intern(priority)
+        self.completed = completed
+        self._row = None
+
+    @property
+    def due_date(self):
+        if self.due_ordinal is not None:
+            return format_due_date(self.due_ordinal)
+        return self._due_text
+
+    @due_date.setter
+    def due_date(self, value):
+        self.due_ordinal, self._due_text = parse_due_date(value)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "text": self.text,
+            "due_date": self.due_date,
+            "priority": self.priority,
+            "completed": self.completed
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            text=data["text"],
+            due_date=data.get("due_date"),
+            priority=data.get("priority", DEFAULT_PRIORITY),
+            completed=data.get("completed", False),
+            task_id=data.get("id")
+        )
+
+    @classmethod
+    def from_item(cls, item):
+        """Build a task from a saved item, old files store plain strings"""
+        if isinstance(item, str):
+            return cls(text=item)
+        return cls.from_dict(item)
+
+    def __str__(self):
+        # Rows are drawn again on every scroll, a task is only formatted
+        # again once one of the fields it shows is replaced
+        text = self.text
+        priority = self.priority
+        completed = self.completed
+        ordinal = self.due_ordinal
+        row = self._row
+        if (row is not None and row[0] is text and row[1] is priority and row[2] is completed
+                and row[3] == ordinal and row[4] is self._due_text):
+            return row[5]
+
+        status = COMPLETED_MARK if completed else PENDING_MARK
+        priority_mark = PRIORITY_MARKERS.get(priority, DEFAULT_MARKER)
+        due_date = self.due_date
+        if due_date:
+            rendered = f"{status}{priority_mark} {text} [{due_date}]"
+        else:
+            rendered = f"{status}{priority_mark} {text}"
+        self._row = (text, priority, completed, ordinal, self._due_text, rendered)
+        return rendered
+
+
+def assign_ids(items):
+    """Items of a file saved before tasks had ids, as task dicts with new ids
+
+    Ids increase in list order, so ties in the sort orders keep the order
+    of the file. Items that already have an id are kept.
+    """
+    result = []
+    for item in items:
+        if isinstance(item, str):
+            item = Task(text=item).to_dict()
+        elif "id" not in item:
+            item = {"id": new_task_id(), **item}
+        result.append(item)
+    return result
+
+
+class TaskStore:
+    """Column-oriented task list backed by typed arrays
+
+    Numbers cost a few bytes per task instead of one Python object each:
+    ids are 8 bytes, due ordinals 4 bytes (0 for no due date), priority
+    codes and completed flags 1 byte. Values the columns cannot encode
+    (unknown priorities, due dates that are not real dates) are kept in
+    small side dicts keyed by row.
+    """
+
+    OTHER = -1
+
+    def __init__(self):
+        self.ids = array("q")
+        self.texts = []
+        self.priorities = array("b")
+        self.due_ordinals = array("i")
+        self.completed = array("b")
+        self.other_priorities = {}
+        self.other_due_dates = {}
+
+    @classmethod
+    def from_dicts(cls, tasks_data):
+        store = cls()
+        for data in tasks_data:
+            store.append_fields(
+                data.get("id") or new_task_id(), data["text"], data.get("due_date"),
+                data.get("priority", DEFAULT_PRIORITY), data.get("completed", False)
+            )
+        return store
+
+    def append(self, task):
+        self.append_fields(task.id, task.text, task.due_date, task.priority, task.completed)
+
+    def append_fields(self, task_id, text, due_date, priority, completed):
+        row = len(self.texts)
+        self.ids.append(task_id)
+        self.texts.append(text)
+
+        code = PRIORITY_ORDER.get(priority, self.OTHER)
+        if code == self.OTHER:
+            self.other_priorities[row] = priority
+        self.priorities.append(code)
+
+        ordinal, due_text = parse_due_date(due_date)
+        if due_text is not None:
+            self.other_due_dates[row] = due_text
+            ordinal = self.OTHER
+        self.due_ordinals.append(ordinal or 0)
+        self.completed.append(bool(completed))
+
+    def __len__(self):
+        return len(self.texts)
+
+    def priority(self, row):
+        code = self.priorities[row]
+        return PRIORITIES[code] if code != self.OTHER else self.other_priorities[row]
+
+    def due_date(self, row):
+        ordinal = self.due_ordinals[row]
+        if ordinal > 0:
+            return format_due_date(ordinal)
+        if ordinal == self.OTHER:
+            return self.other_due_dates[row]
+        return None
+
+    def __getitem__(self, row):
+        """Build a Task for one row"""
+        return Task(
+            self.texts[row], self.due_date(row), self.priority(row),
+            bool(self.completed[row]), task_id=self.ids[row]
+        )
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def to_dicts(self):
+        return [task.to_dict() for task in self]
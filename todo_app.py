@@ -1,64 +1,50 @@
-import os
-import json
-
-# TODO: CONSOLE APP
+import sys
+import threading
 
+from task_model import Task
+from messages import ENGLISH, TURKISH
+from instrumentation import ENABLED as STATS_ENABLED, memory_snapshot, profiler, stats, timed
 
-# Language dictionaries
-TURKISH = {
-    "app_title": "Görev Yönetim Uygulaması",
-    "menu_list": "1. Görevleri Listele",
-    "menu_add": "2. Yeni Görev Ekle",
-    "menu_edit": "3. Görev Düzenle",
-    "menu_delete": "4. Görev Sil",
-    "menu_language": "5. Dil Değiştir / Change Language",
-    "menu_exit": "6. Çıkış",
-    "menu_choice": "Seçiminizi yapın: ",
-    "invalid_choice": "Geçersiz seçim! Lütfen tekrar deneyin.",
-    "no_tasks": "Hiç görev bulunamadı!",
-    "enter_task": "Görev metni: ",
-    "empty_task": "Boş görev eklenemez!",
-    "task_added": "Görev eklendi.",
-    "enter_task_num": "Görev numarası: ",
-    "invalid_task_num": "Geçersiz görev numarası!",
-    "enter_new_task": "Yeni görev metni: ",
-    "task_edited": "Görev düzenlendi.",
-    "task_deleted": "Görev silindi.",
-    "file_error": "Dosya işlemi sırasında bir hata oluştu: ",
-    "goodbye": "Programdan çıkılıyor. Hoşçakalın!",
-    "lang_changed": "Dil İngilizce olarak değiştirildi."
-}
+# TODO: CONSOLE APP
 
-ENGLISH = {
-    "app_title": "Task Management Application",
-    "menu_list": "1. List Tasks",
-    "menu_add": "2. Add New Task",
-    "menu_edit": "3. Edit Task",
-    "menu_delete": "4. Delete Task",
-    "menu_language": "5. Change Language / Dil Değiştir",
-    "menu_exit": "6. Exit",
-    "menu_choice": "Enter your choice: ",
-    "invalid_choice": "Invalid choice! Please try again.",
-    "no_tasks": "No tasks found!",
-    "enter_task": "Task text: ",
-    "empty_task": "Cannot add empty task!",
-    "task_added": "Task added.",
-    "enter_task_num": "Task number: ",
-    "invalid_task_num": "Invalid task number!",
-    "enter_new_task": "New task text: ",
-    "task_edited": "Task edited.",
-    "task_deleted": "Task deleted.",
-    "file_error": "An error occurred during file operation: ",
-    "goodbye": "Exiting program. Goodbye!",
-    "lang_changed": "Language changed to Turkish."
-}
 
 class TodoApp:
     def __init__(self):
-        self.tasks = []
+        # Imported here, the command line mode loads only what a command needs
+        from task_engine import TaskEngine
+        
+        # Tasks are read, changed and saved like in the GUI, see task_engine.py
+        self.engine = TaskEngine()
         self.language = TURKISH  # Default language
-        self.file_name = "tasks.json"
-        self.load_tasks()
+        self.listed_ids = None  # Task ids by number as last listed, until a change
+        
+        # Tasks are read on a thread while the menu is shown, commands
+        # that need them wait for it
+        self.loader = threading.Thread(target=self.load_tasks, daemon=True)
+        self.loader.start()
+    
+    def wait_for_tasks(self):
+        """Wait until the tasks are loaded"""
+        self.loader.join()
+    
+    def reload_if_changed(self):
+        """Read the tasks again when another program saved the file"""
+        if not self.engine.changed():
+            return
+        try:
+            self.engine.follow()
+            self.listed_ids = None
+            print(self.language["file_reloaded"])
+        except Exception as e:
+            print(f"{self.language['file_error']}{str(e)}")
+    
+    def task_at(self, task_num):
+        """Task listed with task_num, None if there is none"""
+        if self.listed_ids is None:
+            self.listed_ids = list(self.engine.tasks)
+        if task_num < 1 or task_num > len(self.listed_ids):
+            return None
+        return self.engine.tasks.get(self.listed_ids[task_num - 1])
     
     def display_menu(self):
         """Display the main menu in the current language"""
@@ -71,38 +57,43 @@ class TodoApp:
         print(self.language["menu_delete"])
         print(self.language["menu_language"])
         print(self.language["menu_exit"])
+        if STATS_ENABLED:
+            print(self.language["menu_stats"])
         print("-" * 40)
     
+    @timed("list_tasks")
     def list_tasks(self):
         """List all tasks with numbers"""
-        if not self.tasks:
+        if not self.engine.tasks:
             print(self.language["no_tasks"])
             return
         
         print("\n--- Tasks ---")
-        for i, task in enumerate(self.tasks, 1):
+        self.listed_ids = list(self.engine.tasks)
+        for i, task in enumerate(self.engine.tasks.values(), 1):
             print(f"{i}. {task}")
     
+    @timed("add_task")
     def add_task(self):
         """Add a new task"""
-        task = input(self.language["enter_task"]).strip()
-        if not task:
+        text = input(self.language["enter_task"]).strip()
+        if not text:
             print(self.language["empty_task"])
             return
         
-        self.tasks.append(task)
-        self.save_tasks()
+        self.save_changes([self.engine.add(Task(text))])
         print(self.language["task_added"])
     
+    @timed("edit_task")
     def edit_task(self):
         """Edit an existing task"""
         self.list_tasks()
-        if not self.tasks:
+        if not self.engine.tasks:
             return
         
         try:
-            task_num = int(input(self.language["enter_task_num"]))
-            if task_num < 1 or task_num > len(self.tasks):
+            task = self.task_at(int(input(self.language["enter_task_num"])))
+            if task is None:
                 print(self.language["invalid_task_num"])
                 return
             
@@ -111,30 +102,32 @@ class TodoApp:
                 print(self.language["empty_task"])
                 return
             
-            self.tasks[task_num - 1] = new_task
-            self.save_tasks()
+            # Only the text changes, the task keeps its other fields
+            task.text = new_task
+            self.save_changes([self.engine.update(task)])
             print(self.language["task_edited"])
         except ValueError:
             print(self.language["invalid_task_num"])
     
+    @timed("delete_task")
     def delete_task(self):
         """Delete a task"""
         self.list_tasks()
-        if not self.tasks:
+        if not self.engine.tasks:
             return
         
         try:
-            task_num = int(input(self.language["enter_task_num"]))
-            if task_num < 1 or task_num > len(self.tasks):
+            task = self.task_at(int(input(self.language["enter_task_num"])))
+            if task is None:
                 print(self.language["invalid_task_num"])
                 return
             
-            del self.tasks[task_num - 1]
-            self.save_tasks()
+            self.save_changes([self.engine.delete(task)])
             print(self.language["task_deleted"])
         except ValueError:
             print(self.language["invalid_task_num"])
     
+    @timed("change_language")
     def change_language(self):
         """Switch between Turkish and English"""
         if self.language == TURKISH:
@@ -143,29 +136,56 @@ class TodoApp:
             self.language = TURKISH
         print(self.language["lang_changed"])
     
-    def save_tasks(self):
-        """Save tasks to a file"""
+    @timed("save_changes")
+    def save_changes(self, records):
+        """Persist change records, as journal records, row changes or a full save"""
+        conflicts = self.engine.shared.conflicts
+        # Numbers change with the tasks
+        self.listed_ids = None
         try:
-            with open(self.file_name, 'w', encoding='utf-8') as file:
-                json.dump(self.tasks, file, ensure_ascii=False, indent=2)
+            self.engine.persist(records)
+            # Only worth a word when both sides changed the same tasks
+            if self.engine.shared.conflicts != conflicts:
+                print(self.language["changes_merged"])
         except Exception as e:
             print(f"{self.language['file_error']}{str(e)}")
     
+    @timed("load_tasks")
     def load_tasks(self):
         """Load tasks from a file"""
         try:
-            if os.path.exists(self.file_name):
-                with open(self.file_name, 'r', encoding='utf-8') as file:
-                    self.tasks = json.load(file)
+            self.engine.load()
         except Exception as e:
             print(f"{self.language['file_error']}{str(e)}")
     
+    def show_stats(self):
+        """Print the recorded timings and take a profile or memory snapshot on request"""
+        print(stats.format())
+        choice = input(self.language["stats_choice"]).strip().lower()
+        try:
+            if choice == 'p':
+                if profiler.running:
+                    print(profiler.stop())
+                else:
+                    profiler.start()
+                    print(self.language["profile_started"])
+            elif choice == 'm':
+                print(memory_snapshot() or self.language["memory_tracing"])
+            elif choice == 's':
+                print(self.language["stats_saved"] + stats.dump())
+        except OSError as e:
+            print(f"{self.language['file_error']}{str(e)}")
+    
     def run(self):
         """Main application loop"""
         while True:
             self.display_menu()
             choice = input(self.language["menu_choice"])
             
+            if choice in ('1', '2', '3', '4'):
+                self.wait_for_tasks()
+                self.reload_if_changed()
+            
             if choice == '1':
                 self.list_tasks()
             elif choice == '2':
@@ -179,9 +199,15 @@ class TodoApp:
             elif choice == '6':
                 print(self.language["goodbye"])
                 break
+            elif choice == '7' and STATS_ENABLED:
+                self.show_stats()
             else:
                 print(self.language["invalid_choice"])
 
 if __name__ == "__main__":
+    # Arguments run one command without the menu, see todo_cli.py
+    if len(sys.argv) > 1:
+        from todo_cli import main
+        sys.exit(main(sys.argv[1:]))
     app = TodoApp()
     app.run() 
\ No newline at end of file
@@ -1,128 +1,95 @@
-import os
-import json
+import gc
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox
+from backends import TASK_FILE
+from concurrency import ConflictError
+from file_watch import FileWatcher
+from instrumentation import ENABLED as STATS_ENABLED, measure, memory_snapshot, profiler, stats, timed
+from messages import ENGLISH, TURKISH
+from storage import JOURNAL_SUFFIX, SAVE_INTERVAL_MS, BackgroundWriter
+from search_index import SearchIndex, SearchResults
+from task_engine import TaskEngine
+from task_index import TaskIndexes
+from task_model import Task, parse_due_date
+from view_cache import load_view, save_view
+from virtual_list import VirtualListbox
 
-# Language dictionaries
-TURKISH = {
-    "app_title": "Görev Yönetim Uygulaması",
-    "task_list": "Görev Listesi",
-    "add_task": "Görev Ekle",
-    "edit_task": "Düzenle",
-    "delete_task": "Sil",
-    "task_entry_label": "Görev Metni:",
-    "due_date_label": "Son Tarih (YYYY-MM-DD):",
-    "priority_label": "Öncelik:",
-    "add_button": "Ekle",
-    "edit_button": "Düzenle",
-    "delete_button": "Sil",
-    "change_lang": "İngilizce'ye Geç",
-    "empty_task": "Boş görev eklenemez!",
-    "task_added": "Görev eklendi.",
-    "task_edited": "Görev düzenlendi.",
-    "task_deleted": "Görev silindi.",
-    "select_task": "Lütfen bir görev seçin.",
-    "file_error": "Dosya işlemi sırasında bir hata oluştu: ",
-    "confirm_delete": "Silme Onayı",
-    "confirm_delete_msg": "Bu görevi silmek istediğinizden emin misiniz?",
-    "yes": "Evet",
-    "no": "Hayır",
-    "completed": "Tamamlandı",
-    "sort_by": "Sıralama:",
-    "sort_by_name": "İsim",
-    "sort_by_priority": "Öncelik",
-    "sort_by_date": "Tarih",
-    "low_priority": "Düşük",
-    "medium_priority": "Orta",
-    "high_priority": "Yüksek",
-    "invalid_date": "Geçersiz tarih formatı! YYYY-MM-DD formatını kullanın."
-}
+# Tasks shown before the rest of the file is read
+FIRST_LOAD_BATCH = 2000
 
-ENGLISH = {
-    "app_title": "Task Management Application",
-    "task_list": "Task List",
-    "add_task": "Add Task",
-    "edit_task": "Edit",
-    "delete_task": "Delete",
-    "task_entry_label": "Task Text:",
-    "due_date_label": "Due Date (YYYY-MM-DD):",
-    "priority_label": "Priority:",
-    "add_button": "Add",
-    "edit_button": "Edit",
-    "delete_button": "Delete",
-    "change_lang": "Switch to Turkish",
-    "empty_task": "Cannot add empty task!",
-    "task_added": "Task added.",
-    "task_edited": "Task edited.",
-    "task_deleted": "Task deleted.",
-    "select_task": "Please select a task.",
-    "file_error": "An error occurred during file operation: ",
-    "confirm_delete": "Delete Confirmation",
-    "confirm_delete_msg": "Are you sure you want to delete this task?",
-    "yes": "Yes",
-    "no": "No",
-    "completed": "Completed",
-    "sort_by": "Sort by:",
-    "sort_by_name": "Name",
-    "sort_by_priority": "Priority",
-    "sort_by_date": "Date",
-    "low_priority": "Low",
-    "medium_priority": "Medium",
-    "high_priority": "High",
-    "invalid_date": "Invalid date format! Please use YYYY-MM-DD format."
-}
+# Time spent reading and indexing tasks between two UI events while
+# loading. Batches are sized to it, within these bounds
+LOAD_SLICE_MS = 30
+MIN_LOAD_BATCH = 100
+MAX_LOAD_BATCH = 20000
 
-class Task:
-    def __init__(self, text, due_date=None, priority="medium", completed=False):
-        self.text = text
-        self.due_date = due_date
-        self.priority = priority
-        self.completed = completed
-    
-    def to_dict(self):
-        return {
-            "text": self.text,
-            "due_date": self.due_date,
-            "priority": self.priority,
-            "completed": self.completed
-        }
-    
-    @classmethod
-    def from_dict(cls, data):
-        return cls(
-            text=data["text"],
-            due_date=data.get("due_date"),
-            priority=data.get("priority", "medium"),
-            completed=data.get("completed", False)
-        )
-    
-    def __str__(self):
-        status = "✓ " if self.completed else "□ "
-        priority_markers = {"low": "⬇️", "medium": "➡️", "high": "⬆️"}
-        priority_mark = priority_markers.get(self.priority, "➡️")
-        
-        date_str = ""
-        if self.due_date:
-            date_str = f" [{self.due_date}]"
-        
-        return f"{status}{priority_mark} {self.text}{date_str}"
+# Time spent looking for search matches between two UI events
+SEARCH_SLICE_MS = 5
+
+# Share of the tasks changed by another program above which the indexes
+# are built again instead of updated task by task
+REINDEX_SHARE = 0.1
 
 class TodoAppGUI:
     def __init__(self, root):
         self.root = root
-        self.tasks = []
         self.language = TURKISH  # Default language
-        self.file_name = "tasks.json"
-        self.selected_index = None
+        self.file_name = TASK_FILE
+        self.selected_id = None
         self.task_labels = []
         self.sort_by = "name"  # Default sort by name
+        self.indexes = TaskIndexes()  # One sorted index per sort order
+        self.search_index = SearchIndex()
+        self.search_query = ""
+        self.search_results = None  # Matching tasks while searching or filtering
+        self.search_job = None
+        self.filters = (False, None, None)  # Hide completed, priority, due
+        # Tasks are read, changed and saved like in the console, see
+        # task_engine.py. Other programs may save the same file, their
+        # changes are merged when a save finds them (see concurrency.py)
+        self.engine = TaskEngine(self.file_name)
+        self.merge_job = None
+        # A paged backend (SQLite) keeps the tasks, rows are read from it
+        # as they are shown instead of holding every task in memory
+        self.paged = self.engine.paged
         
-        # Load tasks
-        self.load_tasks()
+        # Saves are coalesced and written on a background thread
+        self.save_interval_ms = SAVE_INTERVAL_MS
+        self.save_job = None
+        self.check_job = None
+        self.writer = BackgroundWriter(self.write_tasks_data)
+        
+        # Tasks are loaded in growing batches between UI events
+        self.loading = False
+        self.loaded = False
+        self.load_batch_size = 0
+        
+        # Tasks and sorted rows saved by the last session, mapped into
+        # memory and shown until the tasks are loaded
+        self.cached_view = None if self.paged else load_view(self.file_name)
         
         # Set up the UI
         self.setup_ui()
         
+        # Load tasks once the window is drawn, the first batch is shown
+        # before the rest is read
+        self.root.after_idle(self.root.after, 1, self.load_tasks)
+        
+        # Write pending changes before the window closes
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Timings recorded with TODO_STATS set are shown with F12
+        self.stats_window = None
+        if STATS_ENABLED:
+            self.root.bind("<F12>", self.show_stats)
+        
+        # Show what other programs save to the file while the window is open
+        self.reload_job = None
+        changes = self.file_name + ("-wal" if self.paged else JOURNAL_SUFFIX)
+        self.watcher = FileWatcher(self.root, [self.file_name, changes], self.on_file_change)
+        self.watcher.start()
+    
     def setup_ui(self):
         # Configure the root window
         self.root.title(self.language["app_title"])
@@ -165,21 +132,68 @@ class TodoAppGUI:
         self.sort_combobox.pack(side=tk.LEFT, padx=5)
         self.sort_combobox.bind("<<ComboboxSelected>>", self.on_sort_change)
         
+        # Search entry, the list is filtered while typing
+        self.search_entry = ttk.Entry(sort_frame, width=25)
+        self.search_entry.pack(side=tk.RIGHT, padx=5)
+        self.search_entry.bind("<KeyRelease>", self.on_search_change)
+        self.search_label = ttk.Label(sort_frame, text=self.language["search"])
+        self.search_label.pack(side=tk.RIGHT, padx=5)
+        if self.paged:
+            # Only tasks held in memory are indexed
+            self.search_entry.config(state=tk.DISABLED)
+        
+        # Filter options frame
+        filter_frame = ttk.Frame(main_frame)
+        filter_frame.pack(side=tk.TOP, fill=tk.X, pady=(0, 10))
+        self.filter_label = ttk.Label(filter_frame, text=self.language["filter"])
+        self.filter_label.pack(side=tk.LEFT, padx=5)
+        
+        # Hide completed checkbox
+        self.hide_completed_var = tk.BooleanVar(value=False)
+        self.hide_completed_check = ttk.Checkbutton(
+            filter_frame,
+            text=self.language["hide_completed"],
+            variable=self.hide_completed_var,
+            command=self.on_filter_change
+        )
+        self.hide_completed_check.pack(side=tk.LEFT, padx=5)
+        
+        # Priority filter combobox
+        self.priority_filter = ttk.Combobox(
+            filter_frame,
+            values=self.priority_filter_values(),
+            width=14,
+            state="readonly"
+        )
+        self.priority_filter.current(0)  # Default to all priorities
+        self.priority_filter.pack(side=tk.LEFT, padx=5)
+        self.priority_filter.bind("<<ComboboxSelected>>", self.on_filter_change)
+        
+        # Due date filter combobox
+        self.due_filter = ttk.Combobox(
+            filter_frame,
+            values=self.due_filter_values(),
+            width=16,
+            state="readonly"
+        )
+        self.due_filter.current(0)  # Default to all dates
+        self.due_filter.pack(side=tk.LEFT, padx=5)
+        self.due_filter.bind("<<ComboboxSelected>>", self.on_filter_change)
+        if self.paged:
+            # Like search, filters use the indexes of tasks held in memory
+            for widget in (self.hide_completed_check, self.priority_filter, self.due_filter):
+                widget.config(state=tk.DISABLED)
+        
         # Task list frame (left side)
         list_frame = ttk.LabelFrame(main_frame, text=self.language["task_list"])
         list_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 5))
         self.list_frame = list_frame
         
-        # Task listbox with scrollbar
-        task_listbox = tk.Listbox(list_frame, selectmode=tk.SINGLE, font=("Arial", 10))
+        # Task list with scrollbar, only the visible rows are drawn
+        task_listbox = VirtualListbox(list_frame, self.row_text, font=("Arial", 10))
         task_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
         self.task_listbox = task_listbox
         
-        # Scrollbar for listbox
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=task_listbox.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        task_listbox.config(yscrollcommand=scrollbar.set)
-        
         # Bind listbox selection event
         task_listbox.bind('<<ListboxSelect>>', self.on_task_select)
         
@@ -269,6 +283,7 @@ class TodoAppGUI:
         # Populate the listbox
         self.populate_task_list()
     
+    @timed("on_sort_change")
     def on_sort_change(self, event):
         selection = self.sort_combobox.get()
         if selection == self.language["sort_by_name"]:
@@ -280,66 +295,195 @@ class TodoAppGUI:
         
         self.populate_task_list()
     
+    @timed("on_search_change")
+    def on_search_change(self, event):
+        query = self.search_entry.get()
+        if query != self.search_query:
+            # Typing on only keeps tasks that already match
+            previous = self.search_query if query.startswith(self.search_query) else None
+            self.search_query = query
+            # The cached rows cannot be searched, show the loaded tasks
+            self.drop_cached_view()
+            self.populate_task_list(previous)
+    
+    def priority_filter_values(self):
+        return [
+            self.language["all_priorities"],
+            self.language["low_priority"],
+            self.language["medium_priority"],
+            self.language["high_priority"]
+        ]
+    
+    def due_filter_values(self):
+        return [self.language["all_dates"], self.language["overdue"], self.language["due_week"]]
+    
+    @timed("on_filter_change")
+    def on_filter_change(self, event=None):
+        # Combobox entries are in the order of the filter values
+        filters = (
+            self.hide_completed_var.get(),
+            (None, "low", "medium", "high")[self.priority_filter.current()],
+            (None, "overdue", "week")[self.due_filter.current()]
+        )
+        if filters != self.filters:
+            self.filters = filters
+            # The cached rows cannot be filtered, show the loaded tasks
+            self.drop_cached_view()
+            self.populate_task_list()
+    
     def is_valid_date(self, date_str):
-        if not date_str:
-            return True  # Empty date is allowed
-        
-        try:
-            # Check format YYYY-MM-DD
-            if len(date_str) != 10:
-                return False
-            
-            year, month, day = date_str.split('-')
-            if len(year) != 4 or len(month) != 2 or len(day) != 2:
-                return False
-            
-            # Check if they are numbers
-            int(year)
-            int(month)
-            int(day)
-            
-            return True
-        except:
-            return False
+        # Empty date is allowed, otherwise a YYYY-MM-DD date that exists
+        # (2025-02-31 does not), parsed once like the due dates of tasks
+        return not date_str or parse_due_date(date_str)[0] is not None
     
-    def sort_tasks(self):
-        if self.sort_by == "name":
-            return sorted(self.tasks, key=lambda t: t.text.lower())
-        elif self.sort_by == "priority":
-            priority_order = {"low": 0, "medium": 1, "high": 2}
-            return sorted(self.tasks, key=lambda t: priority_order.get(t.priority, 1), reverse=True)
-        elif self.sort_by == "date":
-            # Sort by due date with None values at the end
-            return sorted(self.tasks, key=lambda t: (t.due_date is None, t.due_date or "9999-12-31"))
-        
-        return self.tasks
+    def sort_index(self):
+        """Sorted index of the current sort order"""
+        return self.indexes[self.sort_by]
     
-    def populate_task_list(self):
-        # Clear the listbox
-        self.task_listbox.delete(0, tk.END)
+    @timed("populate_task_list")
+    def populate_task_list(self, previous_query=None):
+        """Show the whole list in the current sort order
         
-        # Sort tasks
-        sorted_tasks = self.sort_tasks()
+        previous_query is a search the current one extends, the fewer
+        tasks that match are then found from its results.
+        """
+        # The indexes are already sorted and rows are formatted lazily
+        # when they scroll into view
+        if self.paged:
+            self.task_listbox.set_row_count(self.engine.backend.count())
+            self.show_selection()
+            return
+        if self.cached_view is not None:
+            self.task_listbox.set_row_count(len(self.cached_view))
+            return
+        
+        previous = self.search_results if previous_query is not None else None
+        self.search_results = None
+        ids = self.matching_ids(previous_query, None if previous is None else previous.ids)
+        if ids is not None:
+            self.search_results = SearchResults(self.sort_index(), ids, self.engine.tasks, previous)
+            first, last = self.task_listbox.visible_rows()
+            self.find_matches(last + self.task_listbox.overscan)
+            self.task_listbox.set_row_count(len(self.search_results))
+        else:
+            self.task_listbox.set_row_count(len(self.sort_index()))
+        self.show_selection()
+    
+    def show_selection(self):
+        """Select the row of the selected task again, forget the task if it is not shown"""
+        if self.selected_id is None:
+            return
+        task = self.get_task(self.selected_id)
+        if self.paged:
+            row = self.engine.backend.row_of(self.sort_by, task)
+        elif self.search_results is not None:
+            row = self.search_results.row_of(task.id)
+        else:
+            row = self.sort_index().row_of(task)
+        if row is None:
+            self.selected_id = None
+            self.edit_button.config(state=tk.DISABLED)
+            self.delete_button.config(state=tk.DISABLED)
+        else:
+            self.task_listbox.selection_set(row)
+    
+    def matching_ids(self, previous_query="", within=None):
+        """Ids of the tasks that match the search and the filters, None for all
         
-        # Add tasks to the listbox
-        for task in sorted_tasks:
-            self.task_listbox.insert(tk.END, str(task))
+        within may hold the matches of previous_query, which the search extends.
+        """
+        ids = self.search_index.search(self.search_query, previous_query, within)
+        # Filter results are cached by the indexes until a task changes
+        filtered = self.indexes.filter(*self.filters)
+        if filtered is None:
+            return ids
+        if ids is None:
+            return filtered
+        return ids & filtered
+    
+    def task_at(self, row):
+        """Task shown in a list row"""
+        if self.paged:
+            return self.engine.backend.task_at(self.sort_by, row)
+        if self.search_results is not None:
+            return self.engine.tasks[self.search_results.id_at(row)]
+        return self.engine.tasks[self.sort_index().id_at(row)]
+    
+    def get_task(self, task_id):
+        if self.paged:
+            return self.engine.backend.get(task_id)
+        return self.engine.tasks[task_id]
+    
+    def row_text(self, row):
+        if self.cached_view is not None:
+            # Read from the mapped cache as the row is shown
+            return str(self.cached_view.task_at(self.sort_by, row))
+        if self.search_results is not None and not self.search_results.found(row):
+            # Drawn again once the matches up to this row are found
+            if self.search_job is None:
+                self.search_job = self.root.after(1, self.continue_search)
+            return "…"
+        return str(self.task_at(row))
     
+    def find_matches(self, rows):
+        """Look for the first rows of the search results, for a few milliseconds"""
+        deadline = time.perf_counter() + SEARCH_SLICE_MS / 1000
+        while not self.search_results.complete(rows) and time.perf_counter() < deadline:
+            self.search_results.scan()
+    
+    def continue_search(self):
+        """Find more matches for the rows on screen, between UI events"""
+        self.search_job = None
+        if self.search_results is not None:
+            self.find_matches(self.task_listbox.rendered[1])
+            self.task_listbox.redraw()
+    
+    def insert_task_row(self, task):
+        """Add a task to the indexes and the list, return its row"""
+        if self.paged:
+            # The database is already changed, its indexes find the row
+            row = self.engine.backend.row_of(self.sort_by, task)
+        else:
+            row = self.indexes.add(task)[self.sort_by]
+            self.search_index.add(task)
+            if self.search_results is not None:
+                # Search and filter again, the row is None if the task
+                # does not match
+                self.populate_task_list()
+                if self.search_results is not None:
+                    row = self.search_results.row_of(task.id)
+                return row
+        self.task_listbox.row_inserted(row)
+        return row
+    
+    def remove_task_row(self, task):
+        """Remove a task from the indexes and the list, return its former row"""
+        if self.paged:
+            # Called before the database changes
+            row = self.engine.backend.row_of(self.sort_by, task)
+        else:
+            row = self.indexes.remove(task)[self.sort_by]
+            self.search_index.remove(task)
+            if self.search_results is not None:
+                self.populate_task_list()
+                return None
+        self.task_listbox.row_deleted(row)
+        return row
+    
+    @timed("on_task_select")
     def on_task_select(self, event):
         # Get selected indices
         selection = self.task_listbox.curselection()
-        if selection:
-            # Get the selected index
-            index = selection[0]
-            sorted_tasks = self.sort_tasks()
-            selected_task = sorted_tasks[index]
+        # Cached rows are not tasks that can be edited yet
+        if selection and self.cached_view is None:
+            # Map the selected row to its task
+            selected_task = self.task_at(selection[0])
+            self.selected_id = selected_task.id
             
-            # Find the actual index in the original tasks list
-            self.selected_index = self.tasks.index(selected_task)
-            
-            # Enable edit and delete buttons
-            self.edit_button.config(state=tk.NORMAL)
-            self.delete_button.config(state=tk.NORMAL)
+            # Enable edit and delete buttons, once every task is loaded
+            if not self.loading:
+                self.edit_button.config(state=tk.NORMAL)
+                self.delete_button.config(state=tk.NORMAL)
             
             # Display the selected task in the entry fields
             self.task_entry.delete(0, tk.END)
@@ -356,7 +500,7 @@ class TodoAppGUI:
             # Set completed status
             self.completed_var.set(selected_task.completed)
         else:
-            self.selected_index = None
+            self.selected_id = None
             self.edit_button.config(state=tk.DISABLED)
             self.delete_button.config(state=tk.DISABLED)
     
@@ -388,11 +532,12 @@ class TodoAppGUI:
             return
         
         # Add task
-        self.tasks.append(task)
-        self.save_tasks()
+        self.record_change(self.engine.add(task))
         
         # Update listbox
-        self.populate_task_list()
+        row = self.insert_task_row(task)
+        if row is not None:
+            self.task_listbox.see(row)
         
         # Clear entry fields
         self.task_entry.delete(0, tk.END)
@@ -405,28 +550,39 @@ class TodoAppGUI:
     
     def edit_task(self):
         # Check if a task is selected
-        if self.selected_index is None:
+        if self.selected_id is None:
             messagebox.showwarning("", self.language["select_task"])
             return
         
         # Get task from form
-        task = self.get_task_from_form()
-        if task is None:
+        new_task = self.get_task_from_form()
+        if new_task is None:
             return
         
-        # Update task
-        self.tasks[self.selected_index] = task
-        self.save_tasks()
+        # Replace the task, it keeps its id and list position. A save in
+        # progress may still be reading the old one
+        task = self.get_task(self.selected_id)
+        self.remove_task_row(task)
+        new_task.id = task.id
+        task = new_task
+        self.record_change(self.engine.update(task))
         
         # Update listbox
-        self.populate_task_list()
+        row = self.insert_task_row(task)
+        if row is not None:
+            self.task_listbox.selection_set(row)
+            self.task_listbox.see(row)
+            # A search forgets the selection while the task is out of the list
+            self.selected_id = task.id
+            self.edit_button.config(state=tk.NORMAL)
+            self.delete_button.config(state=tk.NORMAL)
         
         # Show confirmation
         messagebox.showinfo("", self.language["task_edited"])
     
     def delete_task(self):
         # Check if a task is selected
-        if self.selected_index is None:
+        if self.selected_id is None:
             messagebox.showwarning("", self.language["select_task"])
             return
         
@@ -437,15 +593,15 @@ class TodoAppGUI:
         ):
             return
         
-        # Delete task
-        del self.tasks[self.selected_index]
-        self.save_tasks()
+        # Update listbox, while the task still has its row
+        task = self.get_task(self.selected_id)
+        self.remove_task_row(task)
         
-        # Update listbox
-        self.populate_task_list()
+        # Delete task
+        self.record_change(self.engine.delete(task))
         
         # Clear selection and entry
-        self.selected_index = None
+        self.selected_id = None
         self.task_entry.delete(0, tk.END)
         self.due_date_entry.delete(0, tk.END)
         self.priority_var.set("medium")
@@ -476,7 +632,17 @@ class TodoAppGUI:
         self.due_date_label.config(text=self.language["due_date_label"])
         self.priority_label.config(text=self.language["priority_label"])
         self.sort_label.config(text=self.language["sort_by"])
+        self.search_label.config(text=self.language["search"])
         self.completed_check.config(text=self.language["completed"])
+        self.filter_label.config(text=self.language["filter"])
+        self.hide_completed_check.config(text=self.language["hide_completed"])
+        
+        # Update filter comboboxes
+        for combobox, values in ((self.priority_filter, self.priority_filter_values()),
+                                 (self.due_filter, self.due_filter_values())):
+            current_index = combobox.current()
+            combobox.config(values=values)
+            combobox.current(current_index)
         
         # Update sort combobox
         current_index = self.sort_combobox.current()
@@ -487,29 +653,380 @@ class TodoAppGUI:
         ])
         self.sort_combobox.current(current_index)
     
+    def show_stats(self, event=None):
+        """Show the recorded timings, F12 with TODO_STATS set"""
+        if self.stats_window is not None and self.stats_window.winfo_exists():
+            self.stats_window.lift()
+            self.refresh_stats()
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title(self.language["stats_title"])
+        self.stats_window = window
+        
+        # Buttons below the report
+        button_frame = ttk.Frame(window)
+        button_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=5, pady=5)
+        ttk.Button(button_frame, text=self.language["refresh"],
+                   command=self.refresh_stats).pack(side=tk.LEFT, padx=5)
+        self.profile_button = ttk.Button(
+            button_frame,
+            text=self.language["stop_profile" if profiler.running else "start_profile"],
+            command=self.toggle_profile
+        )
+        self.profile_button.pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text=self.language["memory_snapshot"],
+                   command=self.take_memory_snapshot).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text=self.language["save_stats"],
+                   command=self.save_stats).pack(side=tk.LEFT, padx=5)
+        
+        # Report text
+        self.stats_text = tk.Text(window, width=90, height=30, font=("Courier", 9))
+        self.stats_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.refresh_stats()
+    
+    def refresh_stats(self, report=""):
+        """Show the current timings, followed by a report if there is one"""
+        self.stats_text.delete("1.0", tk.END)
+        self.stats_text.insert(tk.END, stats.format())
+        if report:
+            self.stats_text.insert(tk.END, "\n\n" + report)
+    
+    def toggle_profile(self):
+        if profiler.running:
+            report = profiler.stop()
+            self.profile_button.config(text=self.language["start_profile"])
+            self.refresh_stats(report)
+        else:
+            profiler.start()
+            self.profile_button.config(text=self.language["stop_profile"])
+    
+    def take_memory_snapshot(self):
+        report = memory_snapshot()
+        self.refresh_stats(report or self.language["memory_tracing"])
+    
+    def save_stats(self):
+        try:
+            file_name = stats.dump()
+            self.refresh_stats(self.language["stats_saved"] + file_name)
+        except OSError as e:
+            messagebox.showerror("", f"{self.language['file_error']}{str(e)}")
+    
+    @timed("record_change")
+    def record_change(self, record):
+        """Persist a single change, as a journal record or a full save"""
+        if self.paged:
+            self.change_row(record)
+            return
+        
+        if not self.engine.use_journal:
+            self.save_tasks()
+            return
+        
+        try:
+            changes, due = self.engine.log_changes([record])
+            if changes[0] or changes[1]:
+                # Changes of another program, shown once this event has
+                # updated the row of its own task
+                self.root.after_idle(self.apply_file_changes, *changes)
+            if due:
+                # Fold the journal back into the snapshot. This waits for the
+                # write so no record appended meanwhile can be dropped
+                self.flush_tasks(wait=True)
+        except ConflictError:
+            # The record no longer fits the file another program saved
+            self.schedule_merge()
+        except Exception as e:
+            messagebox.showerror("", f"{self.language['file_error']}{str(e)}")
+    
+    def change_row(self, record):
+        """Change the task in the database, the next save commits it"""
+        try:
+            self.engine.change_rows([record])
+        except Exception as e:
+            messagebox.showerror("", f"{self.language['file_error']}{str(e)}")
+        self.save_tasks()
+    
     def save_tasks(self):
-        """Save tasks to a file"""
+        """Schedule a save, coalescing bursts of changes into one write"""
+        if self.save_job is None:
+            self.save_job = self.root.after(self.save_interval_ms, self.flush_tasks)
+    
+    @timed("flush_tasks")
+    def flush_tasks(self, wait=False):
+        """Hand the current tasks to the background writer"""
+        if self.save_job is not None:
+            self.root.after_cancel(self.save_job)
+            self.save_job = None
+        
+        if self.paged:
+            # Every change since the last save goes into one transaction
+            try:
+                self.engine.backend.commit()
+            except Exception as e:
+                messagebox.showerror("", f"{self.language['file_error']}{str(e)}")
+            return
+        
+        self.report_save_error()
+        # Only the dict is copied here, tasks are replaced rather than
+        # changed, so the writer can turn them into items on its own thread
+        self.writer.submit(dict(self.engine.tasks))
+        if wait:
+            self.writer.flush()
+            self.report_save_error()
+        elif self.check_job is None:
+            self.check_job = self.root.after(self.save_interval_ms, self.check_save)
+    
+    def check_save(self):
+        """Report the result of a background save once it is written"""
+        self.check_job = None
+        if not self.writer.idle():
+            self.check_job = self.root.after(self.save_interval_ms, self.check_save)
+            return
+        self.report_save_error()
+    
+    @timed("write_tasks_data")
+    def write_tasks_data(self, tasks):
+        """Write tasks to a file, runs on the writer thread"""
+        # Raises ConflictError if another program saved since the last read
+        self.engine.write(tasks)
+    
+    def report_save_error(self):
+        """Show the error of the last background save, return True if there was one"""
+        error = self.writer.pop_error()
+        if isinstance(error, ConflictError):
+            # Not an error, the save is retried once the changes are merged
+            self.schedule_merge()
+            return False
+        if error is not None:
+            messagebox.showerror("", f"{self.language['file_error']}{str(error)}")
+        return error is not None
+    
+    def schedule_merge(self):
+        """Merge the changes of another program once the current event is handled"""
+        # The event may still be updating the indexes of the tasks
+        if self.merge_job is None:
+            self.merge_job = self.root.after_idle(self.merge_file_changes)
+    
+    @timed("merge_file_changes")
+    def merge_file_changes(self):
+        """Merge the tasks with the file another program saved, then save them"""
+        self.merge_job = None
+        # A save still being written may have found the same changes
+        self.writer.flush()
+        self.report_save_error()
+        if self.merge_job is not None:
+            self.root.after_cancel(self.merge_job)
+            self.merge_job = None
+        
+        conflicts = self.engine.shared.conflicts
         try:
-            tasks_data = [task.to_dict() for task in self.tasks]
-            with open(self.file_name, 'w', encoding='utf-8') as file:
-                json.dump(tasks_data, file, ensure_ascii=False, indent=2)
+            self.engine.merge()
         except Exception as e:
             messagebox.showerror("", f"{self.language['file_error']}{str(e)}")
+            return
+        
+        # Show the merged list, the selected task may have changed or gone
+        self.build_indexes(self.engine.tasks.values())
+        self.selected_id = None
+        self.edit_button.config(state=tk.DISABLED)
+        self.delete_button.config(state=tk.DISABLED)
+        self.populate_task_list()
+        
+        self.flush_tasks(wait=True)
+        if self.engine.shared.conflicts != conflicts:
+            messagebox.showinfo("", self.language["changes_merged"])
     
+    def drop_cached_view(self):
+        """Stop showing the view cache of the last session"""
+        if self.cached_view is not None:
+            self.cached_view.close()
+            self.cached_view = None
+    
+    def save_view(self):
+        """Cache the tasks and the rows of every sort order for the next start"""
+        rows = {sort_by: index.ids() for sort_by, index in self.indexes.indexes.items()}
+        try:
+            # Written again only if the task file changed since it was saved
+            save_view(self.file_name, self.engine.shared.stamp, self.engine.tasks, rows)
+        except OSError:
+            pass  # The next start only misses the preview
+    
+    def on_close(self):
+        """Write pending changes and close the window"""
+        self.watcher.stop()
+        if self.reload_job is not None:
+            self.root.after_cancel(self.reload_job)
+            self.reload_job = None
+        if self.save_job is not None:
+            self.flush_tasks()
+        if self.check_job is not None:
+            self.root.after_cancel(self.check_job)
+            self.check_job = None
+        # Changes another program saved meanwhile are merged before closing
+        self.writer.flush()
+        save_failed = self.report_save_error()
+        while self.merge_job is not None:
+            self.root.after_cancel(self.merge_job)
+            self.merge_file_changes()
+            save_failed = self.report_save_error()
+        self.writer.close()
+        # Only a fully loaded list that matches the saved file is worth
+        # showing next time
+        if self.loaded and not (self.paged or save_failed):
+            self.save_view()
+        self.drop_cached_view()
+        self.engine.close()
+        self.root.destroy()
+    
+    @timed("on_file_change")
+    def on_file_change(self):
+        """Show what another program saved, reading only what changed if possible"""
+        self.reload_job = None
+        # A load in progress reads the file again if it changes
+        if not self.loaded:
+            return
+        if self.paged:
+            # Other connections commit to the same database
+            self.engine.backend.invalidate()
+            self.after_file_change()
+            return
+        if not self.engine.changed():
+            return
+        # A save that found the change first schedules a merge
+        self.report_save_error()
+        if self.save_job is not None or self.merge_job is not None or not self.writer.idle():
+            # Local changes are saved first, the save merges the other ones
+            self.reload_job = self.root.after(self.save_interval_ms, self.on_file_change)
+            return
+        
+        try:
+            self.apply_file_changes(*self.engine.follow())
+        except Exception as e:
+            messagebox.showerror("", f"{self.language['file_error']}{str(e)}")
+    
+    def apply_file_changes(self, removed, added):
+        """Show the tasks another program removed, changed or added"""
+        self.update_indexes(removed, added)
+        self.after_file_change()
+    
+    def update_indexes(self, removed, added):
+        """Index the tasks that replaced others, or everything again if many did"""
+        tasks = self.engine.tasks
+        if len(removed) + len(added) > REINDEX_SHARE * len(tasks):
+            self.build_indexes(tasks.values())
+        else:
+            for task in removed:
+                self.indexes.remove(task)
+                self.search_index.remove(task)
+            for task in added:
+                self.indexes.add(task)
+                self.search_index.add(task)
+    
+    def build_indexes(self, tasks):
+        """Index tasks from scratch"""
+        # The objects frozen after loading may be dropped now
+        gc.unfreeze()
+        self.indexes.build(tasks)
+        self.search_index.build(tasks)
+    
+    def after_file_change(self):
+        """Show the changed list, forgetting a selected task that is gone"""
+        if self.selected_id is not None:
+            try:
+                self.get_task(self.selected_id)
+            except KeyError:
+                self.selected_id = None
+                self.edit_button.config(state=tk.DISABLED)
+                self.delete_button.config(state=tk.DISABLED)
+        self.drop_cached_view()
+        self.populate_task_list()
+    
+    @timed("load_tasks")
     def load_tasks(self):
-        """Load tasks from a file"""
+        """Start loading tasks from a file"""
+        if self.paged:
+            # Nothing to read ahead, rows are fetched as they are shown
+            try:
+                self.populate_task_list()
+            except Exception as e:
+                messagebox.showerror("", f"{self.language['file_error']}{str(e)}")
+            self.loaded = True
+            return
+        
+        self.build_indexes([])
+        self.engine.start_reading()
+        self.load_batch_size = FIRST_LOAD_BATCH
+        
+        # Changes would interleave with the tasks still being read
+        self.loading = True
+        self.add_button.config(state=tk.DISABLED)
+        self.load_next_batch()
+    
+    @timed("load_next_batch")
+    def load_next_batch(self):
+        """Read and show the next batch of tasks"""
+        start = time.perf_counter()
         try:
-            if os.path.exists(self.file_name):
-                with open(self.file_name, 'r', encoding='utf-8') as file:
-                    tasks_data = json.load(file)
-                    
-                    # Convert old format if needed
-                    if tasks_data and isinstance(tasks_data[0], str):
-                        self.tasks = [Task(text=text) for text in tasks_data]
-                    else:
-                        self.tasks = [Task.from_dict(task_dict) for task_dict in tasks_data]
+            # Convert old format if needed
+            with measure("load_next_batch: parse"):
+                batch = self.engine.read_batch(self.load_batch_size)
         except Exception as e:
+            self.finish_loading(replay=False)
             messagebox.showerror("", f"{self.language['file_error']}{str(e)}")
+            return
+        
+        with measure("load_next_batch: sort"):
+            self.indexes.extend(batch)
+        with measure("load_next_batch: search index"):
+            self.search_index.extend(batch)
+        
+        if len(batch) < self.load_batch_size:
+            self.finish_loading()
+            return
+        
+        self.populate_task_list()
+        # Indexing a task gets dearer as the list grows, the next batch is
+        # sized so that it takes about LOAD_SLICE_MS again
+        elapsed_ms = max((time.perf_counter() - start) * 1000, 1)
+        self.load_batch_size = min(max(int(self.load_batch_size * LOAD_SLICE_MS / elapsed_ms),
+                                       MIN_LOAD_BATCH), MAX_LOAD_BATCH)
+        self.root.after(1, self.load_next_batch)
+    
+    @timed("finish_loading")
+    def finish_loading(self, replay=True):
+        """Apply the journal once the snapshot is read and allow changes"""
+        try:
+            if replay:
+                # Journaled edits replace task objects
+                self.update_indexes(*self.engine.finish_reading())
+        except ConflictError:
+            # Another program saved while the file was read, read it again
+            self.load_tasks()
+            return
+        except Exception as e:
+            messagebox.showerror("", f"{self.language['file_error']}{str(e)}")
+            read_failed = True
+        else:
+            read_failed = False
+        
+        # A missing or stale cache is saved again for the tasks just read,
+        # so the next start does not depend on this session closing cleanly
+        stale = (self.cached_view is None
+                 or self.cached_view.stamp != self.engine.shared.stamp)
+        
+        self.loading = False
+        self.loaded = True
+        # The tasks and index keys just read live as long as the list.
+        # Frozen, the full collections that later changes set off skip them
+        # instead of walking every task, until build_indexes() lets them go
+        gc.freeze()
+        self.drop_cached_view()
+        self.add_button.config(state=tk.NORMAL)
+        self.populate_task_list()
+        if stale and not (self.paged or read_failed):
+            # Written once the list is shown, when the window is idle
+            self.root.after_idle(self.save_view)
 
 if __name__ == "__main__":
     root = tk.Tk()
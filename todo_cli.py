@@ -0,0 +1,241 @@
+import sys
+import json
+import argparse
+
+from task_model import DEFAULT_PRIORITY, PRIORITIES, Task, parse_due_date
+
+# Command line interface of the console version, for scripts.
+#
+#   python todo_app.py add "Fatura öde" --due 2025-06-01 --priority high
+#   python todo_app.py add --stdin < tasks.txt
+#   python todo_app.py list --sort date --json
+#   python todo_app.py done 3 5
+#   python todo_app.py query rapor --pending
+#   python todo_app.py query --due-within 7 --pending
+#
+# Tasks are addressed by their number in `list`, like in the menu, and
+# changed through their ids, which other programs do not renumber. The
+# task file is read and saved by the engine the menu and the GUI use (see
+# task_engine.py). Modules are imported by the commands that need them, and
+# `add` appends to the journal without reading the task list, so a call is
+# cheap enough to run thousands of times from a shell loop. --json prints
+# one object per task, with the id as a string: ids use 63 bits, more than
+# JSON numbers keep exactly in JavaScript and many jq builds. `list` and
+# `query` never write: a file saved before tasks had ids gets them from the
+# first command that changes it.
+
+SORT_ORDERS = ("file", "name", "priority", "date")
+
+
+class CommandError(Exception):
+    pass
+
+
+def check_due_date(value):
+    """None for an empty due date, otherwise a valid YYYY-MM-DD date"""
+    if not value:
+        return None
+    if parse_due_date(value)[0] is None:
+        raise CommandError(f"invalid due date {value!r}, use YYYY-MM-DD")
+    return value
+
+
+def numbered_tasks(tasks, numbers):
+    """Tasks with numbers as shown by `list`"""
+    tasks = list(tasks.values())
+    for number in numbers:
+        if not 1 <= number <= len(tasks):
+            raise CommandError(f"no task number {number}, there are {len(tasks)} tasks")
+    return [tasks[number - 1] for number in numbers]
+
+
+def print_tasks(rows, as_json):
+    """Print (number, task) rows"""
+    if as_json:
+        for number, task in rows:
+            item = task.to_dict()
+            item["id"] = str(item["id"])
+            print(json.dumps(dict(number=number, **item), ensure_ascii=False))
+        return
+    for number, task in rows:
+        print(f"{number}. {task}")
+
+
+def print_result(args, key, count):
+    if args.json:
+        print(json.dumps({key: count}))
+    else:
+        print(f"{count} tasks {key}")
+
+
+def select_tasks(tasks, args, words=()):
+    """Numbered tasks that pass the filters of args, in the requested order"""
+    from task_index import SORT_KEYS
+
+    rows = list(enumerate(tasks.values(), 1))
+    if args.pending:
+        rows = [row for row in rows if not row[1].completed]
+    if args.completed:
+        rows = [row for row in rows if row[1].completed]
+    if words:
+        from search_index import tokenize
+        rows = [
+            row for row in rows
+            if all(any(word.startswith(prefix) for word in tokenize(row[1].text)) for prefix in words)
+        ]
+    if args.sort != "file":
+        key = SORT_KEYS[args.sort]
+        rows.sort(key=lambda row: key(row[1]))
+    return rows
+
+
+def cmd_add(args, engine):
+    texts = [args.text] if args.text else []
+    if args.stdin:
+        texts.extend(line.strip() for line in sys.stdin)
+    texts = [text.strip() for text in texts if text.strip()]
+    if not texts:
+        raise CommandError("nothing to add, give a task text or --stdin")
+
+    due_date = check_due_date(args.due)
+    tasks = [Task(text, due_date, args.priority, args.done) for text in texts]
+    engine.append(tasks)
+    print_result(args, "added", len(tasks))
+
+
+def cmd_list(args, engine):
+    print_tasks(select_tasks(engine.load(migrate=False), args), args.json)
+
+
+def cmd_query(args, engine):
+    from search_index import tokenize
+
+    tasks = engine.load(migrate=False)
+    rows = select_tasks(tasks, args, tokenize(" ".join(args.words)))
+    if args.priority:
+        rows = [row for row in rows if row[1].priority == args.priority]
+    if args.due_before or args.overdue or args.due_within is not None:
+        from task_index import TaskIndexes
+
+        # Due dates are looked up in the date index, in the ranges the GUI
+        # filters use, instead of testing every task
+        indexes = TaskIndexes()
+        indexes.build(tasks.values())
+        due = []
+        if args.due_before:
+            due.append(indexes.due_before(check_due_date(args.due_before)))
+        if args.overdue:
+            due.append(indexes.overdue())
+        if args.due_within is not None:
+            due.append(indexes.due_within(args.due_within))
+        ids = set(due[0]).intersection(*due[1:])
+        rows = [row for row in rows if row[1].id in ids]
+    print_tasks(rows, args.json)
+
+
+def cmd_edit(args, engine):
+    task, = numbered_tasks(engine.load(), [args.number])
+    if args.text is not None:
+        if not args.text.strip():
+            raise CommandError("the task text cannot be empty")
+        task.text = args.text.strip()
+    if args.due is not None:
+        task.due_date = check_due_date(args.due)
+    if args.priority is not None:
+        task.priority = args.priority
+
+    engine.persist([engine.update(task)])
+    print_result(args, "edited", 1)
+
+
+def cmd_done(args, engine):
+    records = []
+    for task in numbered_tasks(engine.load(), sorted(set(args.numbers))):
+        task.completed = not args.undo
+        records.append(engine.update(task))
+    engine.persist(records)
+    print_result(args, "updated", len(records))
+
+
+def cmd_delete(args, engine):
+    tasks = numbered_tasks(engine.load(), sorted(set(args.numbers)))
+    engine.persist([engine.delete(task) for task in tasks])
+    print_result(args, "deleted", len(tasks))
+
+
+COMMANDS = {
+    "add": cmd_add,
+    "list": cmd_list,
+    "query": cmd_query,
+    "edit": cmd_edit,
+    "done": cmd_done,
+    "delete": cmd_delete
+}
+
+
+def add_filters(parser):
+    parser.add_argument("--sort", choices=SORT_ORDERS, default="file")
+    state = parser.add_mutually_exclusive_group()
+    state.add_argument("--pending", action="store_true", help="only tasks that are not completed")
+    state.add_argument("--completed", action="store_true", help="only completed tasks")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="todo_app.py", description="Manage tasks without the menu")
+    parser.add_argument("--file", help="task file (default: TODO_TASK_FILE or tasks.json)")
+    parser.add_argument("--json", action="store_true", help="print JSON, one object per line")
+    # --json is also accepted after the command
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--json", action="store_true", default=argparse.SUPPRESS, help=argparse.SUPPRESS)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add = subparsers.add_parser("add", parents=[common], help="add tasks")
+    add.add_argument("text", nargs="?")
+    add.add_argument("--stdin", action="store_true", help="also add one task per line of stdin")
+    add.add_argument("--due", help="due date, YYYY-MM-DD")
+    add.add_argument("--priority", choices=PRIORITIES, default=DEFAULT_PRIORITY)
+    add.add_argument("--done", action="store_true", help="add as completed")
+
+    add_filters(subparsers.add_parser("list", parents=[common], help="list tasks"))
+
+    query = subparsers.add_parser("query", parents=[common], help="find tasks, every word matches the start of a word")
+    query.add_argument("words", nargs="*")
+    query.add_argument("--priority", choices=PRIORITIES)
+    query.add_argument("--due-before", metavar="DATE")
+    query.add_argument("--overdue", action="store_true", help="only tasks whose due date has passed")
+    query.add_argument("--due-within", type=int, metavar="DAYS", help="only tasks due within DAYS days, today being the first")
+    add_filters(query)
+
+    edit = subparsers.add_parser("edit", parents=[common], help="change a task")
+    edit.add_argument("number", type=int)
+    edit.add_argument("--text")
+    edit.add_argument("--due", help='due date, YYYY-MM-DD, "" removes it')
+    edit.add_argument("--priority", choices=PRIORITIES)
+
+    done = subparsers.add_parser("done", parents=[common], help="mark tasks as completed")
+    done.add_argument("numbers", type=int, nargs="+")
+    done.add_argument("--undo", action="store_true", help="mark as not completed")
+
+    delete = subparsers.add_parser("delete", parents=[common], help="delete tasks")
+    delete.add_argument("numbers", type=int, nargs="+")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        from task_engine import TaskEngine
+
+        # Without --file the engine uses backends.TASK_FILE
+        engine = TaskEngine(args.file)
+        try:
+            COMMANDS[args.command](args, engine)
+        finally:
+            engine.close()
+    except CommandError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    return 0
@@ -0,0 +1,177 @@
+import sys
+import json
+import mmap
+import struct
+from array import array
+
+from backends import BinaryBackend
+from storage import atomic_write, file_stamp
+from task_model import Task
+
+# View cache of the GUI, a read-only copy of the task list mapped into
+# memory.
+#
+# When the GUI closes it writes every task and the rows of every sort order
+# next to the task file (tasks.json.view). The next start maps the file
+# instead of parsing it, so the whole list can be painted and scrolled
+# before the task file is read, whatever its size. Layout:
+#
+#     magic          8 bytes  TODOVIEW
+#     header length  uint32   followed by a JSON header: stamp of the task
+#                             file, task count, sort orders, byte order
+#     padding        up to a multiple of 8 bytes
+#     offsets        count + 1 uint64, start of each record and end of the last
+#     rows           count uint32 record numbers per sort order, in row order
+#     records        the tasks in file order, records of BinaryBackend
+#                    without the length prefix
+#
+# Task N is one offset lookup away and the task of a row two, a Task is
+# only built when its row is shown. The cache is used only while the task
+# file and its journal still have the size and modification time it was
+# saved with, and written again when they changed.
+
+VIEW_SUFFIX = ".view"
+MAGIC = b"TODOVIEW"
+
+_header_length = struct.Struct("<I")
+
+
+def _data_start(header_size):
+    """Offset of the offset table, 8 byte aligned"""
+    return -(-(len(MAGIC) + _header_length.size + header_size) // 8) * 8
+
+
+def _read_header(buffer):
+    """(header dict, offset of the offset table) of a view cache"""
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a view cache")
+    size = _header_length.unpack_from(buffer, len(MAGIC))[0]
+    start = len(MAGIC) + _header_length.size
+    header = json.loads(buffer[start:start + size].decode("utf-8"))
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError("View cache of another platform")
+    return header, _data_start(size)
+
+
+class ViewCache:
+    """Tasks and sorted rows of a view cache file, read in place"""
+
+    def __init__(self, file):
+        self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            header, start = _read_header(self._map)
+            self.stamp = header["stamp"]
+            self.count = header["count"]
+            view = memoryview(self._map)
+            end = start + 8 * (self.count + 1)
+            self._offsets = view[start:end].cast("Q")
+            self._rows = {}
+            for sort_by in header["orders"]:
+                start, end = end, end + 4 * self.count
+                self._rows[sort_by] = view[start:end].cast("I")
+            self._records = end
+            view.release()
+        except BaseException:
+            self.close()
+            raise
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, number):
+        """Task saved as record number (in file order)"""
+        start = self._records + self._offsets[number]
+        end = self._records + self._offsets[number + 1]
+        return Task.from_item(BinaryBackend.decode(self._map, start, end))
+
+    def task_at(self, sort_by, row):
+        """Task shown in a row of a sort order"""
+        return self[self._rows[sort_by][row]]
+
+    def close(self):
+        # The views must be released before the map can be closed
+        for view in [getattr(self, "_offsets", None), *getattr(self, "_rows", {}).values()]:
+            if view is not None:
+                view.release()
+        self._map.close()
+
+
+def load_view(file_name):
+    """ViewCache of the last session, None if missing or stale"""
+    try:
+        with open(file_name + VIEW_SUFFIX, 'rb') as file:
+            view = ViewCache(file)
+    except (OSError, ValueError, KeyError, TypeError, struct.error):
+        # A missing or broken cache only costs the preview
+        return None
+    if view.stamp != file_stamp(file_name):
+        view.close()
+        return None
+    return view
+
+
+def view_is_current(file_name, stamp):
+    """True when the view cache was saved for the task file with stamp"""
+    try:
+        with open(file_name + VIEW_SUFFIX, 'rb') as file:
+            head = file.read(len(MAGIC) + _header_length.size)
+            size = _header_length.unpack_from(head, len(MAGIC))[0]
+            header = _read_header(head + file.read(size))[0]
+    except (OSError, ValueError, KeyError, TypeError, struct.error):
+        return False
+    return header["stamp"] == stamp
+
+
+def save_view(file_name, stamp, tasks, rows):
+    """Save tasks ({id: Task} in file order) and rows ({sort order: ids in row order})
+
+    stamp is the file_stamp() of the task file that holds these tasks.
+    """
+    if view_is_current(file_name, stamp):
+        return
+    numbers = {task_id: number for number, task_id in enumerate(tasks)}
+    records = [BinaryBackend.encode(task.to_dict()) for task in tasks.values()]
+    offsets = array("Q", [0])
+    end = 0
+    for record in records:
+        end += len(record)
+        offsets.append(end)
+
+    header = json.dumps({
+        "stamp": stamp,
+        "count": len(records),
+        "orders": list(rows),
+        "byteorder": sys.byteorder
+    }).encode("utf-8")
+    parts = [MAGIC, _header_length.pack(len(header)), header]
+    parts.append(bytes(_data_start(len(header)) - sum(map(len, parts))))
+    parts.append(offsets.tobytes())
+    for ids in rows.values():
+        parts.append(array("I", [numbers[task_id] for task_id in ids]).tobytes())
+    parts.extend(records)
+    atomic_write(file_name + VIEW_SUFFIX, b"".join(parts))
+
+
+def build_view(file_name):
+    """Write the view cache of a task file from its tasks, return the task count"""
+    # Imported here, the GUI only needs to read and save caches
+    from task_engine import TaskEngine
+    from task_index import TaskIndexes
+
+    engine = TaskEngine(file_name)
+    try:
+        tasks = engine.load()
+    finally:
+        engine.close()
+    indexes = TaskIndexes()
+    indexes.build(tasks.values())
+    save_view(file_name, engine.shared.stamp, tasks, {sort_by: index.ids() for sort_by, index in indexes.indexes.items()})
+    return len(tasks)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python view_cache.py TASK_FILE")
+        sys.exit(2)
+    count = build_view(sys.argv[1])
+    print(f"{count} tasks cached in {sys.argv[1] + VIEW_SUFFIX}")
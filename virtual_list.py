@@ -0,0 +1,200 @@
+import tkinter as tk
+import tkinter.font as tkfont
+from tkinter import ttk
+
+from instrumentation import timed
+
+
+class VirtualListbox(ttk.Frame):
+    """Scrollable single-selection list that only draws the rows on screen
+
+    Row texts are requested from row_text(row) when a row is drawn, plus a
+    few rows of overscan above and below the viewport, so the cost of
+    drawing and scrolling does not depend on the number of rows. The owner
+    reports changes with set_row_count, row_inserted and row_deleted.
+
+    Like tk.Listbox, a click or arrow key emits <<ListboxSelect>> and
+    curselection() returns a tuple with the selected row.
+    """
+
+    def __init__(self, master, row_text, font=("Arial", 10), overscan=10, **kwargs):
+        super().__init__(master, **kwargs)
+        self.row_text = row_text
+        self.font = tkfont.Font(font=font)
+        self.row_height = self.font.metrics("linespace") + 2
+        self.overscan = overscan
+        self.row_count = 0
+        self.offset = 0  # Pixels scrolled from the top
+        self.selected = None
+        self.rendered = (0, 0)  # First and past-the-last drawn rows
+
+        self.canvas = tk.Canvas(self, background="white", highlightthickness=0, takefocus=1)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.canvas.bind("<Configure>", lambda event: self.redraw())
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.canvas.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.canvas.bind("<Button-4>", lambda event: self.yview_scroll(-3, "units"))
+        self.canvas.bind("<Button-5>", lambda event: self.yview_scroll(3, "units"))
+        self.canvas.bind("<Up>", lambda event: self.move_selection(-1))
+        self.canvas.bind("<Down>", lambda event: self.move_selection(1))
+        self.canvas.bind("<Prior>", lambda event: self.yview_scroll(-1, "pages"))
+        self.canvas.bind("<Next>", lambda event: self.yview_scroll(1, "pages"))
+
+    # Row bookkeeping
+
+    def set_row_count(self, count):
+        """Replace all rows, used when the whole list is rebuilt"""
+        self.row_count = count
+        self.selected = None
+        self.offset = min(self.offset, self.max_offset())
+        self.redraw()
+
+    def row_inserted(self, row):
+        self.row_count += 1
+        if self.selected is not None and self.selected >= row:
+            self.selected += 1
+        self.row_moved(row)
+
+    def row_deleted(self, row):
+        self.row_count -= 1
+        if self.selected == row:
+            self.selected = None
+        elif self.selected is not None and self.selected > row:
+            self.selected -= 1
+        self.offset = min(self.offset, self.max_offset())
+        self.row_moved(row)
+
+    def row_moved(self, row):
+        # Rows below the drawn ones do not change anything on screen
+        if row < self.rendered[1] or self.rendered[1] < self.visible_rows()[1]:
+            self.redraw()
+        else:
+            self.update_scrollbar()
+
+    # Listbox-like selection interface
+
+    def curselection(self):
+        return () if self.selected is None else (self.selected,)
+
+    def selection_set(self, row):
+        self.selected = row
+        self.redraw()
+
+    def selection_clear(self, first=0, last=None):
+        self.selected = None
+        self.redraw()
+
+    def see(self, row):
+        """Scroll the least amount needed to show row"""
+        top = row * self.row_height
+        bottom = top + self.row_height
+        height = self.canvas.winfo_height()
+        if top < self.offset:
+            self.scroll_to(top)
+        elif bottom > self.offset + height:
+            self.scroll_to(bottom - height)
+
+    def move_selection(self, step):
+        if not self.row_count:
+            return
+        row = 0 if self.selected is None else self.selected + step
+        row = min(max(row, 0), self.row_count - 1)
+        self.selection_set(row)
+        self.see(row)
+        self.event_generate("<<ListboxSelect>>")
+
+    # Drawing
+
+    def visible_rows(self):
+        height = self.canvas.winfo_height()
+        first = int(self.offset // self.row_height)
+        last = min(self.row_count, int((self.offset + height) // self.row_height) + 1)
+        return first, last
+
+    @timed("VirtualListbox.redraw")
+    def redraw(self):
+        """Draw the rows in and around the viewport"""
+        self.canvas.delete("row")
+        first, last = self.visible_rows()
+        first = max(0, first - self.overscan)
+        last = min(self.row_count, last + self.overscan)
+        width = self.canvas.winfo_width()
+
+        for row in range(first, last):
+            y = row * self.row_height - self.offset
+            color = "black"
+            if row == self.selected:
+                self.canvas.create_rectangle(
+                    0, y, width, y + self.row_height,
+                    fill="#3399ff", outline="", tags="row"
+                )
+                color = "white"
+            self.canvas.create_text(
+                4, y + 1, anchor=tk.NW, text=self.row_text(row),
+                font=self.font, fill=color, tags="row"
+            )
+
+        self.rendered = (first, last)
+        self.update_scrollbar()
+
+    def update_scrollbar(self):
+        total = self.row_count * self.row_height
+        if total == 0:
+            self.scrollbar.set(0, 1)
+            return
+        height = self.canvas.winfo_height()
+        self.scrollbar.set(self.offset / total, min(1.0, (self.offset + height) / total))
+
+    # Scrolling
+
+    def max_offset(self):
+        return max(0, self.row_count * self.row_height - self.canvas.winfo_height())
+
+    def scroll_to(self, offset):
+        offset = min(max(0, offset), self.max_offset())
+        delta = offset - self.offset
+        self.offset = offset
+
+        first, last = self.visible_rows()
+        if self.rendered[0] <= first and last <= self.rendered[1]:
+            # Still inside the overscan, just shift the drawn rows
+            self.canvas.move("row", 0, -delta)
+            self.update_scrollbar()
+        else:
+            self.redraw()
+
+    def yview(self, *args):
+        """Scrollbar protocol, same arguments as tk.Listbox.yview"""
+        if not args:
+            total = self.row_count * self.row_height or 1
+            height = self.canvas.winfo_height()
+            return self.offset / total, min(1.0, (self.offset + height) / total)
+        if args[0] == tk.MOVETO:
+            self.scroll_to(float(args[1]) * self.row_count * self.row_height)
+        elif args[0] == tk.SCROLL:
+            self.yview_scroll(int(args[1]), args[2])
+
+    def yview_scroll(self, number, what):
+        if what == tk.PAGES:
+            step = self.canvas.winfo_height() - self.row_height
+        else:
+            step = self.row_height
+        self.scroll_to(self.offset + number * step)
+
+    def on_mouse_wheel(self, event):
+        # Windows reports multiples of 120 per notch, macOS small deltas
+        if abs(event.delta) >= 120:
+            units = -3 * event.delta // 120
+        else:
+            units = -event.delta
+        self.yview_scroll(units, "units")
+
+    def on_click(self, event):
+        self.canvas.focus_set()
+        row = int((event.y + self.offset) // self.row_height)
+        if row < self.row_count:
+            self.selection_set(row)
+            self.event_generate("<<ListboxSelect>>")